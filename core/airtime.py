@@ -0,0 +1,62 @@
+import math
+
+import numpy as np
+
+SPREADING_FACTORS = range(7, 13)
+BANDWIDTHS = (125, 250, 500)  # kHz
+CODING_RATES = range(1, 5)  # 1..4 -> 4/5..4/8
+MAX_PAYLOAD = 255  # bytes
+
+
+def time_on_air(sf, bw, cr, payload_len, preamble=8, explicit_header=True, crc=True, low_data_rate=None):
+    """LoRa time on air in seconds (Semtech SX127x datasheet / AN1200.13).
+
+    `bw` is in kHz and `cr` is 1..4 for 4/5..4/8. Low data rate optimisation
+    is switched on automatically when the symbol time exceeds 16 ms.
+    """
+    symbol_time = (2 ** sf) / (bw * 1000)
+    if low_data_rate is None:
+        low_data_rate = symbol_time > 0.016
+    de = 1 if low_data_rate else 0
+    ih = 0 if explicit_header else 1
+
+    numerator = 8 * payload_len - 4 * sf + 28 + (16 if crc else 0) - 20 * ih
+    payload_symbols = 8 + max(math.ceil(numerator / (4 * (sf - 2 * de))) * (cr + 4), 0)
+    return (preamble + 4.25) * symbol_time + payload_symbols * symbol_time
+
+
+class AirtimeTable:
+    """Time on air precomputed for every (SF, BW, CR, payload length).
+
+    Built once; lookup() is an O(1) array read. Combinations outside the
+    table (e.g. non-standard bandwidths) fall back to time_on_air().
+    """
+
+    def __init__(self, preamble=8, explicit_header=True, crc=True):
+        self.preamble = preamble
+        self.explicit_header = explicit_header
+        self.crc = crc
+        self.bw_index = {bw: i for i, bw in enumerate(BANDWIDTHS)}
+
+        sf = np.arange(7, 13)[:, None, None, None]
+        bw = np.array(BANDWIDTHS, dtype=np.float64)[None, :, None, None]
+        cr = np.arange(1, 5)[None, None, :, None]
+        payload_len = np.arange(MAX_PAYLOAD + 1)[None, None, None, :]
+
+        symbol_time = 2.0 ** sf / (bw * 1000)
+        de = (symbol_time > 0.016).astype(np.int64)
+        ih = 0 if explicit_header else 1
+        numerator = 8 * payload_len - 4 * sf + 28 + (16 if crc else 0) - 20 * ih
+        payload_symbols = 8 + np.maximum(np.ceil(numerator / (4 * (sf - 2 * de))) * (cr + 4), 0)
+        self.table = (preamble + 4.25) * symbol_time + payload_symbols * symbol_time
+
+    def lookup(self, sf, bw, cr, payload_len):
+        """Time on air in seconds"""
+        bw_i = self.bw_index.get(bw)
+        if bw_i is None or not 7 <= sf <= 12 or not 1 <= cr <= 4 or not 0 <= payload_len <= MAX_PAYLOAD:
+            return time_on_air(sf, bw, cr, payload_len, self.preamble, self.explicit_header, self.crc)
+        return float(self.table[sf - 7, bw_i, cr - 1, payload_len])
+
+
+# Shared table used by the protocol and the nodes
+AIRTIME = AirtimeTable()
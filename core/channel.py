@@ -1,57 +1,91 @@
-import random
 import math
 
+import numpy as np
+
+# Path loss exponent, shadowing std-dev (dB) and loss per wall (dB) for each environment
+ENVIRONMENT_PARAMS = {
+    "urban": (3.0, 10.0, 0.0),
+    "suburban": (2.75, 8.0, 0.0),
+    "rural": (2.5, 6.0, 0.0),
+    "free_space": (2.0, 4.0, 0.0),
+    # Multi-wall model for indoor environments: 8dB per wall, 1 wall per 5m
+    "indoor": (3.5, 12.0, 8.0),
+}
+WALL_SPACING = 5.0
+FADING_RANGE = 3.0  # Multipath fading, uniform in [-3, 3] dB
+
+
 class LoRaChannel:
-    def __init__(self, frequency=868e6, bandwidth=125e3, environment="urban"):
+    def __init__(self, frequency=868e6, bandwidth=125e3, environment="urban", shadowing_rng=None, fading_rng=None):
         self.frequency = frequency
         self.bandwidth = bandwidth
-        self.environment = environment
         self.c = 3e8  # Speed of light
+        # Independent generators for shadowing and fading (see core/rng.py)
+        self.shadowing_rng = shadowing_rng if shadowing_rng is not None else np.random.default_rng()
+        self.fading_rng = fading_rng if fading_rng is not None else np.random.default_rng()
+        self.shadowing_map = None  # Optional ShadowingMap replacing the per-packet shadowing draw
+        self.environment_listeners = []  # Called with no arguments after the environment changes
+        self.environment = environment
+
+    @property
+    def environment(self):
+        return self._environment
+
+    @environment.setter
+    def environment(self, environment):
+        self._environment = environment
+        self._resolve_constants()
+        for callback in self.environment_listeners:
+            callback()
 
-    def calculate_path_loss(self, distance):
-        """Calculate path loss using log-distance model"""
+    def _resolve_constants(self):
+        """Resolve per-environment constants once instead of on every link"""
+        # Unknown environments default to urban
+        self.exponent, self.shadowing_std, self.wall_loss = ENVIRONMENT_PARAMS.get(
+            self._environment, ENVIRONMENT_PARAMS["urban"])
+        self.lambda_ = self.c / self.frequency
+        # FSPL = 20*log10(4*pi*d/lambda) = fspl_offset + 20*log10(d)
+        self.fspl_offset = 20 * math.log10(4 * math.pi / self.lambda_)
+        # Free space plus log-distance terms collapse into one slope on log10(d)
+        self.distance_slope = 20 + 10 * self.exponent
+        # Thermal noise floor
+        self.noise_floor = -174 + 10 * math.log10(self.bandwidth)
+
+    def mean_path_loss(self, distance):
+        """Deterministic part of the path loss (FSPL, log-distance and wall terms)"""
         if distance == 0:
             return 0
 
-        # Environment-specific parameters
-        if self.environment == "urban":
-            exponent = 3.0
-            shadowing_std = 10.0
-        elif self.environment == "suburban":
-            exponent = 2.75
-            shadowing_std = 8.0
-        elif self.environment == "rural":
-            exponent = 2.5
-            shadowing_std = 6.0
-        elif self.environment == "free_space":
-            exponent = 2.0
-            shadowing_std = 4.0
-        elif self.environment == "indoor":
-            # Multi-wall model for indoor environments
-            exponent = 3.5
-            shadowing_std = 12.0
-            num_walls = max(1, int(distance / 5))  # 1 wall per 5m
-            wall_loss = 8 * num_walls  # 8dB loss per wall
-        else:  # Default to urban
-            exponent = 3.0
-            shadowing_std = 10.0
-            wall_loss = 0
-
-        # Free space path loss
-        lambda_ = self.c / self.frequency
-        fspl = 20 * math.log10(4 * math.pi * distance / lambda_)
-
-        # Log-distance path loss
-        path_loss_db = fspl + 10 * exponent * math.log10(distance)
+        path_loss_db = self.fspl_offset + self.distance_slope * math.log10(distance)
 
         # Add wall loss for indoor environments
-        if self.environment == "indoor":
-            path_loss_db += wall_loss
+        if self.wall_loss:
+            path_loss_db += self.wall_loss * max(1, int(distance / WALL_SPACING))
+
+        return path_loss_db
+
+    def link_shadowing(self, tx_position, rx_position):
+        """Correlated shadowing of a link from the shadowing map (None without a map)"""
+        if self.shadowing_map is None:
+            return None
+        return self.shadowing_map.link(tx_position, rx_position)
+
+    def calculate_path_loss(self, distance, mean_loss=None, shadowing=None):
+        """Calculate path loss using log-distance model.
+
+        `mean_loss` is the precomputed mean_path_loss(distance) and `shadowing`
+        the link's map shadowing, if known; otherwise shadowing is drawn.
+        """
+        if distance == 0:
+            return 0
 
         # Shadowing effect
-        shadowing = random.gauss(0, shadowing_std)
+        if shadowing is None:
+            shadowing = float(self.shadowing_rng.normal(0, self.shadowing_std))
 
-        return path_loss_db + shadowing
+        if mean_loss is None:
+            mean_loss = self.mean_path_loss(distance)
+        return mean_loss + shadowing
 
     def calculate_rssi(self, tx_power, path_loss):
         """Calculate Received Signal Strength Indicator"""
@@ -59,18 +93,16 @@ class LoRaChannel:
 
     def calculate_snr(self, rssi):
         """Calculate Signal-to-Noise Ratio"""
-        # Thermal noise calculation
-        noise_floor = -174 + 10 * math.log10(self.bandwidth)
-        return rssi - noise_floor
+        return rssi - self.noise_floor
 
-    def simulate_link(self, tx_power, distance):
+    def simulate_link(self, tx_power, distance, mean_loss=None, shadowing=None):
         """Simulate wireless link with realistic parameters"""
-        path_loss = self.calculate_path_loss(distance)
+        path_loss = self.calculate_path_loss(distance, mean_loss, shadowing)
         rssi = self.calculate_rssi(tx_power, path_loss)
         snr = self.calculate_snr(rssi)
 
         # Add multipath fading effect
-        fading = random.uniform(-3, 3)
+        fading = float(self.fading_rng.uniform(-FADING_RANGE, FADING_RANGE))
         rssi += fading
         snr += fading
 
@@ -80,3 +112,36 @@ class LoRaChannel:
             'path_loss': path_loss
         }
 
+    def calculate_path_loss_batch(self, distances):
+        """Vectorized calculate_path_loss over an array of distances"""
+        distances = np.asarray(distances, dtype=float)
+        linked = distances > 0
+        safe = np.where(linked, distances, 1.0)
+
+        path_loss = self.fspl_offset + self.distance_slope * np.log10(safe)
+        if self.wall_loss:
+            path_loss += self.wall_loss * np.maximum(1, np.floor(safe / WALL_SPACING))
+        path_loss += self.shadowing_rng.normal(0.0, self.shadowing_std, size=distances.shape)
+
+        # Zero distance means no path loss, as in the scalar model
+        return np.where(linked, path_loss, 0.0)
+
+    def simulate_links(self, tx_powers, distances):
+        """Vectorized simulate_link.
+
+        Takes arrays (or scalars broadcast against them) of tx powers in dBm and
+        distances in metres and returns a dict of path loss, RSSI and SNR arrays.
+        """
+        distances = np.asarray(distances, dtype=float)
+        tx_powers = np.broadcast_to(np.asarray(tx_powers, dtype=float), distances.shape)
+
+        path_loss = self.calculate_path_loss_batch(distances)
+        fading = self.fading_rng.uniform(-FADING_RANGE, FADING_RANGE, size=distances.shape)
+        rssi = tx_powers - path_loss + fading
+        snr = rssi - self.noise_floor
+
+        return {
+            'rssi': rssi,
+            'snr': snr,
+            'path_loss': path_loss
+        }
@@ -0,0 +1,63 @@
+import os
+import pickle
+import threading
+import zlib
+
+MAGIC = b'LRCKPT1\n'
+
+
+def snapshot(simulation):
+    """Serialise the complete simulation state (nodes, RNGs, queued events, metrics)"""
+    return pickle.dumps(simulation, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def write_checkpoint(path, state, level=6):
+    """Compress a snapshot and write it atomically, so a crash never leaves a torn file"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(zlib.compress(state, level))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    return path
+
+
+def save_checkpoint(simulation, path):
+    return write_checkpoint(path, snapshot(simulation))
+
+
+def load_checkpoint(path):
+    """Restore a simulation saved with save_checkpoint(); continue it with resume()"""
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a simulation checkpoint")
+        return pickle.loads(zlib.decompress(file.read()))
+
+
+class CheckpointWriter:
+    """Compresses and writes snapshots on a background thread.
+
+    Only pickling happens on the simulation thread; at most one write is in
+    flight, a new one waits for the previous to finish.
+    """
+
+    def __init__(self):
+        self.thread = None
+        self.error = None
+
+    def submit(self, path, state):
+        self.wait()
+        self.thread = threading.Thread(target=self._write, args=(path, state), daemon=True)
+        self.thread.start()
+
+    def _write(self, path, state):
+        try:
+            write_checkpoint(path, state)
+        except OSError as e:
+            self.error = e
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
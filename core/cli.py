@@ -0,0 +1,306 @@
+"""Headless command-line runner for LoRaMPP scenarios.
+
+Usage:
+    python -m core.cli run --nodes 50 --environment rural --duration 3600 --output rural.csv
+    python -m core.cli run --duration 86400 --checkpoint day.ckpt --checkpoint-interval 3600
+    python -m core.cli resume day.ckpt
+    python -m core.cli run --nodes 50 --seed 1 --record run.lrrec
+    python -m core.cli replay run.lrrec --event 20000
+    python -m core.cli lifetime --nodes 50 --environment indoor --fraction 0.5 --validate --output lifetime.csv
+    python -m core.cli sweep --nodes 10 50 100 --environment urban rural --adaptive on off \
+        --replications 10 --output sweep.csv
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+from core.checkpoint import load_checkpoint
+from core.destinations import DESTINATION_POLICIES
+from core.histogram import PacketHistograms
+from core.lifetime import BURN_IN, SAMPLES, WARMUP, LifetimeEstimator, compare_lifetimes, simulate_lifetime
+from core.node import RETAIN_COUNTERS, RETENTION_POLICIES
+from core.replay import Recorder, Replayer, load_recording
+from core.simulation import LoRaMPPSimulation
+from core.sweep import run_sweep
+
+ENVIRONMENTS = ["urban", "suburban", "rural", "free_space", "indoor"]
+
+
+def write_metrics_csv(rows, path):
+    """Write a list of metrics dictionaries as one CSV table"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    headers = []
+    for row in rows:
+        for key in row:
+            if key not in headers:
+                headers.append(key)
+
+    with open(path, mode='w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=headers)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def write_rows(rows, path=None):
+    """Write metrics rows to `path`, or to stdout when no path is given"""
+    if path:
+        write_metrics_csv(rows, path)
+        return
+    writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0].keys()))
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def run_scenario(args, seed=None, trace_path=None, histograms=None, record_path=None):
+    """Run one scenario and return its metrics; its packet histograms are merged into `histograms`.
+
+    With `record_path`, the run's random draws and events are saved there for replay.
+    """
+    simulation_args = dict(
+        num_nodes=args.nodes,
+        area_size=args.area,
+        environment=args.environment,
+        adaptive=not args.no_adaptive,
+        seed=seed,
+        trace_path=trace_path,
+        retention=args.retention,
+        destination=args.destination,
+        gateways=args.gateways,
+        correlated_shadowing=args.correlated_shadowing,
+        decorrelation_distance=args.decorrelation_distance,
+        cache_links=args.link_tolerance is not None,
+        link_tolerance=args.link_tolerance or 0.0
+    )
+    if record_path:
+        runner = Recorder(**simulation_args)
+        simulation = runner.simulation
+    else:
+        runner = simulation = LoRaMPPSimulation(**simulation_args)
+    if args.verbose:
+        simulation.signals.log_message.connect(print)
+
+    try:
+        if args.messages:
+            metrics = runner.run(num_messages=args.messages)
+        else:
+            runner.run_with_mobility(duration=args.duration, interval=args.interval,
+                                     checkpoint_path=args.checkpoint, checkpoint_interval=args.checkpoint_interval)
+            metrics = simulation.get_metrics()
+        if histograms is not None:
+            histograms.merge(simulation.histograms)
+        if record_path:
+            runner.recording.save(record_path)
+        return metrics
+    finally:
+        simulation.close()
+
+
+def cmd_replay(args):
+    replayer = Replayer(load_recording(args.recording))
+    if args.event is None:
+        metrics = replayer.replay()
+    else:
+        try:
+            simulation = replayer.seek(args.event)
+        except ValueError as error:
+            sys.exit(str(error))
+        metrics = dict({'Event': simulation.scheduler.events_processed, 'Time (s)': simulation.scheduler.now},
+                       **simulation.get_metrics())
+    write_rows([metrics], args.output)
+
+
+def cmd_lifetime(args):
+    simulation_args = dict(num_nodes=args.nodes, area_size=args.area, environment=args.environment,
+                           adaptive=not args.no_adaptive, seed=args.seed)
+    estimator = LifetimeEstimator(warmup=args.warmup, samples=args.samples, interval=args.interval,
+                                  max_jump=args.max_jump, burn_in=args.burn_in, **simulation_args)
+    curve = estimator.run(fraction=args.fraction, max_time=args.max_time)
+    if not curve.times:
+        sys.exit("No node died within the estimate")
+    write_rows(curve.rows(), args.output)
+
+    first, target = curve.times[0], curve.time_to(args.fraction)
+    print(f"first death at {first:.0f}s, {args.fraction:.0%} dead at "
+          f"{'n/a' if target is None else f'{target:.0f}s'} ({estimator.simulated:.0f}s simulated, "
+          f"{estimator.jumps} jumps, wall time {estimator.wall_time:.1f}s)", file=sys.stderr)
+
+    if args.validate:
+        started = time.time()
+        reference = simulate_lifetime(fraction=args.fraction, max_time=2 * estimator.clock, interval=args.interval,
+                                      **simulation_args)
+        comparison = compare_lifetimes(curve, reference)
+        print(f"full simulation: wall time {time.time() - started:.1f}s, "
+              + ", ".join(f"{key}: {value}" for key, value in comparison.items()), file=sys.stderr)
+
+
+def cmd_resume(args):
+    simulation = load_checkpoint(args.checkpoint)
+    if args.verbose:
+        simulation.signals.log_message.connect(print)
+    try:
+        simulation.resume()
+        metrics = simulation.get_metrics()
+    finally:
+        simulation.close()
+    write_rows([metrics], args.output)
+
+
+def cmd_run(args):
+    if (args.checkpoint or args.record) and args.runs > 1:
+        sys.exit("--checkpoint and --record need --runs 1")
+    if args.checkpoint and args.record:
+        sys.exit("--checkpoint cannot be combined with --record")
+    if args.checkpoint and args.messages:
+        sys.exit("--checkpoint needs a timed run, not --messages")
+    rows = []
+    histograms = PacketHistograms() if args.histograms else None
+    for i in range(args.runs):
+        seed = None if args.seed is None else [args.seed, i]
+        trace_path = None
+        if args.trace:
+            root, ext = os.path.splitext(args.trace)
+            trace_path = args.trace if args.runs == 1 else f"{root}_{i + 1}{ext}"
+        metrics = run_scenario(args, seed, trace_path, histograms, args.record)
+        rows.append(dict({'Run': i + 1}, **metrics))
+        if not args.quiet:
+            print(f"run {i + 1}/{args.runs}: PDR {metrics['PDR (%)']}%, "
+                  f"{metrics['Packets Sent']} packets, {metrics['Active Nodes']} nodes alive",
+                  file=sys.stderr)
+
+    write_rows(rows, args.output)
+    if histograms is not None:
+        histograms.write_csv(args.histograms)
+
+
+def cmd_sweep(args):
+    grid = {
+        'num_nodes': args.nodes,
+        'area_size': args.area,
+        'environment': args.environment,
+        'adaptive': [value == 'on' for value in args.adaptive],
+        'destination': args.destination,
+        'gateways': [args.gateways],
+        'correlated_shadowing': [args.correlated_shadowing],
+    }
+    if args.messages:
+        run_args = {'num_messages': args.messages}
+    else:
+        run_args = {'duration': args.duration, 'interval': args.interval}
+
+    def progress(done, total):
+        if not args.quiet:
+            print(f"\r{done}/{total} runs complete", end="\n" if done == total else "", file=sys.stderr)
+
+    histograms = PacketHistograms() if args.histograms else None
+    rows = run_sweep(grid, replications=args.replications, run_args=run_args, workers=args.workers,
+                     seed=args.seed, progress=progress, histograms=histograms)
+    write_metrics_csv(rows, args.output)
+    if histograms is not None:
+        histograms.write_csv(args.histograms)
+    if not args.quiet:
+        print(f"Wrote {len(rows)} rows to {args.output}", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m core.cli", description="Run LoRaMPP simulations headless")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run one scenario, optionally repeated")
+    run.add_argument("--nodes", type=int, default=10)
+    run.add_argument("--area", type=int, default=100, help="side of the square area in metres")
+    run.add_argument("--environment", choices=ENVIRONMENTS, default="urban")
+    run.add_argument("--no-adaptive", action="store_true", help="disable LoRaMPP parameter adaptation")
+    run.add_argument("--duration", type=float, default=30, help="simulated seconds of the timed run")
+    run.add_argument("--interval", type=float, default=1, help="seconds between mobility ticks")
+    run.add_argument("--messages", type=int, default=0,
+                     help="send this many messages without mobility instead of a timed run")
+    run.add_argument("--destination", choices=list(DESTINATION_POLICIES), default="uniform",
+                     help="how senders pick their destination")
+    run.add_argument("--gateways", type=int, default=1, help="gateway count for --destination nearest-gateway")
+    run.add_argument("--correlated-shadowing", action="store_true",
+                     help="spatially correlated shadowing map instead of a fresh draw per packet")
+    run.add_argument("--decorrelation-distance", type=float, default=None,
+                     help="shadowing decorrelation distance in metres (default: per environment)")
+    run.add_argument("--link-tolerance", type=float, default=None,
+                     help="cache per-link path loss, kept until a node moves this many metres (0: any move)")
+    run.add_argument("--runs", type=int, default=1, help="number of repetitions")
+    run.add_argument("--seed", type=int, default=None, help="seed for reproducible runs")
+    run.add_argument("--output", help="CSV file for the metrics (default: stdout)")
+    run.add_argument("--trace", help="binary per-packet trace file (see core/trace.py)")
+    run.add_argument("--retention", choices=RETENTION_POLICIES, default=RETAIN_COUNTERS,
+                     help="packets kept in node memory (full spills to --trace when given)")
+    run.add_argument("--histograms", help="CSV file for delay/RSSI/SNR/airtime percentiles per SF, merged over runs")
+    run.add_argument("--checkpoint", help="save the simulation state to this file during and at the end of a timed run")
+    run.add_argument("--checkpoint-interval", type=float, default=600,
+                     help="simulated seconds between checkpoints")
+    run.add_argument("--record", help="save the random draws and event stream to this file for replay")
+    run.add_argument("--verbose", action="store_true", help="print the simulation log")
+    run.add_argument("--quiet", action="store_true", help="suppress progress output")
+    run.set_defaults(func=cmd_run)
+
+    resume = commands.add_parser("resume", help="continue a timed run from a checkpoint")
+    resume.add_argument("checkpoint")
+    resume.add_argument("--output", help="CSV file for the metrics (default: stdout)")
+    resume.add_argument("--verbose", action="store_true", help="print the simulation log")
+    resume.set_defaults(func=cmd_resume)
+
+    replay = commands.add_parser("replay", help="re-execute a recorded run without drawing random numbers")
+    replay.add_argument("recording")
+    replay.add_argument("--event", type=int, help="stop just before this event index and report the state there")
+    replay.add_argument("--output", help="CSV file for the metrics (default: stdout)")
+    replay.set_defaults(func=cmd_replay)
+
+    lifetime = commands.add_parser("lifetime", help="estimate the alive-nodes-over-time curve by fast-forwarding")
+    lifetime.add_argument("--nodes", type=int, default=10)
+    lifetime.add_argument("--area", type=int, default=100, help="side of the square area in metres")
+    lifetime.add_argument("--environment", choices=ENVIRONMENTS, default="urban")
+    lifetime.add_argument("--no-adaptive", action="store_true", help="disable LoRaMPP parameter adaptation")
+    lifetime.add_argument("--seed", type=int, default=None, help="seed for reproducible runs")
+    lifetime.add_argument("--fraction", type=float, default=1.0, help="stop once this fraction of nodes is dead")
+    lifetime.add_argument("--max-time", type=float, default=float("inf"), help="stop at this simulated time")
+    lifetime.add_argument("--interval", type=float, default=1, help="seconds between mobility ticks")
+    lifetime.add_argument("--warmup", type=float, default=WARMUP, help="simulated seconds per drain-rate profile")
+    lifetime.add_argument("--samples", type=int, default=SAMPLES, help="sub-windows per profile")
+    lifetime.add_argument("--burn-in", type=float, default=BURN_IN,
+                          help="simulated seconds before the first profile")
+    lifetime.add_argument("--max-jump", type=float, default=None,
+                          help="longest analytic jump in seconds (default: up to the next death)")
+    lifetime.add_argument("--validate", action="store_true",
+                          help="also run the full simulation and report the estimate's error")
+    lifetime.add_argument("--output", help="CSV file for the lifetime curve (default: stdout)")
+    lifetime.set_defaults(func=cmd_lifetime)
+
+    sweep = commands.add_parser("sweep", help="run a parameter grid in parallel")
+    sweep.add_argument("--nodes", type=int, nargs="+", default=[10])
+    sweep.add_argument("--area", type=int, nargs="+", default=[100])
+    sweep.add_argument("--environment", choices=ENVIRONMENTS, nargs="+", default=["urban"])
+    sweep.add_argument("--adaptive", choices=["on", "off"], nargs="+", default=["on", "off"])
+    sweep.add_argument("--destination", choices=list(DESTINATION_POLICIES), nargs="+", default=["uniform"])
+    sweep.add_argument("--gateways", type=int, default=1)
+    sweep.add_argument("--correlated-shadowing", action="store_true")
+    sweep.add_argument("--replications", type=int, default=1)
+    sweep.add_argument("--duration", type=float, default=30)
+    sweep.add_argument("--interval", type=float, default=1)
+    sweep.add_argument("--messages", type=int, default=0)
+    sweep.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    sweep.add_argument("--seed", type=int, default=0, help="master seed for the per-run seeds")
+    sweep.add_argument("--output", default="sweep_results.csv")
+    sweep.add_argument("--histograms", help="CSV file for percentiles per environment and SF, merged over runs")
+    sweep.add_argument("--quiet", action="store_true")
+    sweep.set_defaults(func=cmd_sweep)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
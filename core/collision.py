@@ -0,0 +1,60 @@
+import heapq
+
+CAPTURE_THRESHOLD = 6.0  # dB a packet must exceed an interferer by to survive
+
+
+class Transmission:
+    """One packet on the air over [start, end)"""
+    __slots__ = ('src', 'dst', 'payload_len', 'start', 'end', 'frequency', 'sf', 'bw', 'cr', 'tx_power', 'distance',
+                 'signal_quality', 'collided', 'src_position', 'dst_position')
+
+    def __init__(self, src, dst, payload_len, start, end, frequency, sf, tx_power, distance, signal_quality, bw=125,
+                 cr=1):
+        self.src = src
+        self.dst = dst
+        # Positions at the start of the packet, used for interference at the receivers
+        self.src_position = src.position
+        self.dst_position = dst.position
+        self.payload_len = payload_len
+        self.start = start
+        self.end = end
+        self.frequency = frequency
+        # Radio settings the packet was sent with; the node may adapt before it ends
+        self.sf = sf
+        self.bw = bw
+        self.cr = cr
+        self.tx_power = tx_power
+        self.distance = distance
+        self.signal_quality = signal_quality
+        self.collided = False
+
+    @property
+    def airtime(self):
+        return self.end - self.start
+
+
+class InterferenceIndex:
+    """Time-ordered index of airtime intervals per (channel, SF).
+
+    Transmissions arrive in non-decreasing start order (virtual time), so an
+    interval still in the index when a new packet starts overlaps it. Each
+    (channel, SF) keeps a min-heap on end time; finished intervals are evicted
+    from the top, which keeps insertion and eviction O(log n).
+    """
+
+    def __init__(self):
+        self.active = {}  # (frequency, sf) -> heap of (end, seq, transmission)
+        self._seq = 0
+
+    def add(self, transmission):
+        """Insert a transmission and return the other senders' ones it overlaps"""
+        heap = self.active.setdefault((transmission.frequency, transmission.sf), [])
+        while heap and heap[0][0] <= transmission.start:
+            heapq.heappop(heap)
+        overlapping = [entry[2] for entry in heap if entry[2].src is not transmission.src]
+        heapq.heappush(heap, (transmission.end, self._seq, transmission))
+        self._seq += 1
+        return overlapping
+
+    def __len__(self):
+        return sum(len(heap) for heap in self.active.values())
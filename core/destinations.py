@@ -0,0 +1,109 @@
+import numpy as np
+
+
+class AliveIndex:
+    """Set of live node rows with O(1) removal and uniform sampling.
+
+    Rows are kept densely packed in `members`, with `slots` mapping each row
+    to its position (-1 once dead). It listens for deaths and revivals on
+    the NodeArray, so it never has to rescan the energy column.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        alive = np.flatnonzero(store.alive)
+        self.members = np.zeros(len(store), dtype=np.int64)
+        self.members[:len(alive)] = alive
+        self.slots = np.full(len(store), -1, dtype=np.int64)
+        self.slots[alive] = np.arange(len(alive))
+        self.count = len(alive)
+        store.add_death_listener(self.remove)
+        store.add_revive_listener(self.add)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, row):
+        return self.slots[row] >= 0
+
+    def add(self, rows):
+        for row in np.atleast_1d(rows).tolist():
+            if self.slots[row] >= 0:
+                continue
+            self.members[self.count] = row
+            self.slots[row] = self.count
+            self.count += 1
+
+    def remove(self, rows):
+        # Swap each removed row with the last live one
+        for row in np.atleast_1d(rows).tolist():
+            slot = self.slots[row]
+            if slot < 0:
+                continue
+            self.count -= 1
+            last = self.members[self.count]
+            self.members[slot] = last
+            self.slots[last] = slot
+            self.slots[row] = -1
+
+    def rows(self):
+        return self.members[:self.count]
+
+    def sample(self, rng, exclude=None):
+        """A uniformly chosen live row other than `exclude`, or None if there is none"""
+        skip = self.slots[exclude] if exclude is not None else -1
+        choices = self.count - (skip >= 0)
+        if choices <= 0:
+            return None
+        slot = int(rng.integers(choices))
+        if 0 <= skip <= slot:
+            slot += 1  # Step over the excluded row
+        return int(self.members[slot])
+
+
+class UniformDestination:
+    """Any live node other than the sender, with equal probability"""
+
+    def __init__(self, simulation):
+        self.alive = simulation.alive_nodes
+
+    def choose(self, src, rng):
+        return self.alive.sample(rng, exclude=src.index)
+
+
+class NeighborDestination:
+    """A live node within communication range of the sender"""
+
+    def __init__(self, simulation):
+        self.store = simulation.node_array
+        self.spatial_index = simulation.spatial_index
+        self.radius = simulation.comm_range
+
+    def choose(self, src, rng):
+        rows = self.spatial_index.neighbors(src.index, self.radius)
+        rows = rows[self.store.alive[rows]]
+        if not len(rows):
+            return None
+        return int(rows[rng.integers(len(rows))])
+
+
+class NearestGatewayDestination:
+    """The closest live gateway; gateways are the first `simulation.gateways` rows"""
+
+    def __init__(self, simulation):
+        self.store = simulation.node_array
+        self.gateways = np.arange(min(simulation.gateways, len(self.store)))
+
+    def choose(self, src, rng):
+        gateways = self.gateways[self.store.alive[self.gateways] & (self.gateways != src.index)]
+        if not len(gateways):
+            return None
+        offsets = self.store.position[gateways].astype(np.float64) - self.store.position[src.index]
+        return int(gateways[np.argmin(offsets[:, 0] ** 2 + offsets[:, 1] ** 2)])
+
+
+DESTINATION_POLICIES = {
+    'uniform': UniformDestination,
+    'neighbors': NeighborDestination,
+    'nearest-gateway': NearestGatewayDestination,
+}
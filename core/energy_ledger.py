@@ -0,0 +1,173 @@
+from array import array
+
+import numpy as np
+
+from core.energy_model import STATES
+
+STATE_NAMES = tuple(STATES)  # Column order of the per-state arrays
+STATE_CODES = {name: code for code, name in enumerate(STATE_NAMES)}
+SLEEP = STATE_CODES['SLEEP']
+
+
+class EnergyLedger:
+    """Radio energy of every node, integrated over virtual time.
+
+    Each node sits in a base state (SLEEP unless changed with set_base_state)
+    and leaves it only for recorded activity intervals such as a TX or RX
+    window. Recording an interval appends four numbers to flat columns;
+    nothing is drained until settle(now), which charges the base state for the
+    elapsed time plus every pending interval up to `now` in a few array
+    operations, and drains the NodeArray through consume_energy() so deaths
+    and the metrics aggregator see the change. Intervals still running at
+    `now` carry over to the next settle. Transition energy (wake-up and radio
+    startup) follows EnergyModel.calculate_energy.
+
+    Overlapping intervals on one node are charged once, over their union, in
+    the most power-hungry state active at each moment, so a node receiving two
+    colliding packets pays for one RX window. An interval that starts while
+    another is running on the same node pays no transition energy.
+    """
+
+    def __init__(self, store, voltage=3.3, now=0.0):
+        self.store = store
+        self.voltage = voltage
+        # Power (W) per state and transition energy (J) from each base state into each state
+        self.power = np.array([STATES[name]['current'] * voltage / 1000 for name in STATE_NAMES])
+        startup = np.array([STATES[name].get('startup', 0.0) for name in STATE_NAMES]) * voltage
+        wakeup = STATES['SLEEP']['wakeup'] * voltage
+        self.transition = np.tile(startup, (len(STATE_NAMES), 1))
+        self.transition[SLEEP] += wakeup
+        self.transition[SLEEP, SLEEP] -= wakeup
+        self.base = np.full(len(store), SLEEP, dtype=np.int8)
+        self.settled_at = now
+        # Energy (J) charged so far per node and state
+        self.charged = np.zeros((len(store), len(STATE_NAMES)))
+        self._clear_pending()
+        store.ledger = self
+
+    def _clear_pending(self):
+        self.rows = array('q')
+        self.states = array('b')
+        self.starts = array('d')
+        self.ends = array('d')
+        self.fresh = array('b')  # Transition energy not charged yet
+
+    def __len__(self):
+        return len(self.rows)
+
+    def set_base_state(self, rows, state):
+        """Change the state that `rows` return to between activities (e.g. IDLE for gateways)"""
+        self.base[rows] = STATE_CODES[state]
+
+    def record(self, row, state, start, end):
+        """Node `row` is in `state` from virtual time `start` to `end`"""
+        self.rows.append(row)
+        self.states.append(STATE_CODES[state])
+        self.starts.append(start)
+        self.ends.append(end)
+        self.fresh.append(1)
+
+    def settle(self, now):
+        """Charge all energy used up to virtual time `now`; returns the per-node drain"""
+        if now < self.settled_at:
+            raise ValueError(f"Cannot settle at t={now}, the ledger is already settled to t={self.settled_at}")
+        store = self.store
+        elapsed = now - self.settled_at
+        base_power = self.power[self.base]
+        drain = base_power * elapsed
+        charged = np.zeros_like(self.charged)
+        charged[np.arange(len(store)), self.base] = drain
+        transitions = np.zeros(len(store))
+
+        if len(self.rows):
+            rows = np.frombuffer(self.rows, dtype=np.int64)
+            states = np.frombuffer(self.states, dtype=np.int8)
+            starts = np.frombuffer(self.starts, dtype=np.float64)
+            ends = np.frombuffer(self.ends, dtype=np.float64)
+            fresh = np.frombuffer(self.fresh, dtype=np.int8)
+
+            due = starts <= now
+            if due.any():
+                self._charge_active(rows[due], states[due].astype(np.int64), np.maximum(starts[due], self.settled_at),
+                                    np.minimum(ends[due], now), fresh[due].astype(bool), drain, charged, transitions)
+
+            # Keep what is still in the future; running intervals restart at `now`. One
+            # starting exactly at `now` has not been charged yet, transition included
+            keep = ends > now
+            carry = keep & (starts < now)
+            starts = np.where(carry, now, starts)[keep]
+            fresh = np.where(carry, 0, fresh)[keep]
+            rows, states, ends = rows[keep], states[keep], ends[keep]
+            self._clear_pending()
+            self.rows.frombytes(rows.tobytes())
+            self.states.frombytes(states.tobytes())
+            self.starts.frombytes(starts.tobytes())
+            self.ends.frombytes(ends.tobytes())
+            self.fresh.frombytes(fresh.tobytes())
+
+        # However many intervals overlap, a node never draws more than its most power-hungry state
+        if np.any(drain - transitions > self.power.max() * elapsed * (1 + 1e-9) + 1e-12):
+            raise RuntimeError(f"Energy ledger charged more than the radio's peak power up to t={now}")
+
+        # Dead nodes draw nothing
+        alive = np.flatnonzero(store.alive)
+        used = np.minimum(drain[alive], store.energy[alive])
+        scale = np.divide(used, drain[alive], out=np.zeros_like(used), where=drain[alive] > 0)
+        self.charged[alive] += charged[alive] * scale[:, None]
+        store.consume_energy(alive, drain[alive])
+        self.settled_at = now
+        return drain
+
+    def _charge_active(self, rows, states, starts, ends, fresh, drain, charged, transitions):
+        """Add the activity intervals to `drain` and `charged`, each node's union charged once"""
+        size = len(self.store)
+        # Every distinct (row, time) boundary in order; consecutive points of one row bound a segment
+        times, rank = np.unique(np.concatenate((starts, ends)), return_inverse=True)
+        keys = np.concatenate((rows, rows)) * len(times) + rank.reshape(-1)
+        points = np.unique(keys)
+        first = np.searchsorted(points, keys[:len(rows)])
+        last = np.searchsorted(points, keys[len(rows):])
+        point_rows = points // len(times)
+        same = point_rows[1:] == point_rows[:-1]
+        length = np.zeros(len(points))
+        length[:-1] = np.where(same, np.diff(times[points % len(times)]), 0.0)
+
+        # Intervals of each state covering each segment; a segment runs in the highest-power one
+        cover = np.zeros((len(points) + 1, len(STATE_NAMES)), dtype=np.int64)
+        np.add.at(cover, (first, states), 1)
+        np.add.at(cover, (last, states), -1)
+        running = np.cumsum(cover[:-1], axis=0)
+        cover = running > 0
+        active = cover.any(axis=1)
+        state = np.argmax(np.where(cover, self.power, -1.0), axis=1)
+
+        # The base state was already charged for this time; add only the difference
+        r, s, duration = point_rows[active], state[active], length[active]
+        base = self.base[r]
+        drain += np.bincount(r, weights=(self.power[s] - self.power[base]) * duration, minlength=size)
+        np.add.at(charged, (r, s), self.power[s] * duration)
+        np.add.at(charged, (r, base), -self.power[base] * duration)
+
+        # An interval pays its transition unless the radio is already on through its start
+        # (running across it, not just ending there); simultaneous starts pay once
+        ending = np.bincount(last, minlength=len(points))
+        across = np.zeros(len(points), dtype=bool)
+        across[1:] = same & (running[:-1].sum(axis=1) - ending[1:] > 0)
+        order = np.argsort(-self.power[states], kind='stable')
+        order = order[fresh[order] & ~across[first[order]]]
+        points_woken, unique = np.unique(first[order], return_index=True)
+        r, s = point_rows[points_woken], states[order[unique]]
+        transition = self.transition[self.base[r], s]
+        transitions += np.bincount(r, weights=transition, minlength=size)
+        drain += np.bincount(r, weights=transition, minlength=size)
+        np.add.at(charged, (r, s), transition)
+
+    def rebase(self, now):
+        """Charge every pending interval in full and restart the clock at `now` (a new run)"""
+        latest = max(self.ends) if len(self.ends) else self.settled_at
+        self.settle(max(latest, self.settled_at))
+        self.settled_at = now
+
+    def breakdown(self):
+        """Total energy (J) charged per state over all nodes"""
+        return {name: float(total) for name, total in zip(STATE_NAMES, self.charged.sum(axis=0))}
@@ -1,12 +1,16 @@
+# Current draw (mA) and transition times (s) per radio state
+STATES = {
+    'TX': {'current': 120, 'startup': 0.002},  # 2ms startup
+    'RX': {'current': 10, 'startup': 0.001},
+    'IDLE': {'current': 1},
+    'SLEEP': {'current': 0.01, 'wakeup': 0.005}
+}
+
+
 class EnergyModel:
     def __init__(self, voltage=3.3):
         self.voltage = voltage
-        self.states = {
-            'TX': {'current': 120, 'startup': 0.002},  # 2ms startup
-            'RX': {'current': 10, 'startup': 0.001},
-            'IDLE': {'current': 1},
-            'SLEEP': {'current': 0.01, 'wakeup': 0.005}
-        }
+        self.states = STATES  # Shared, read-only
         self.current_state = 'SLEEP'
 
     def calculate_energy(self, new_state, duration):
@@ -0,0 +1,161 @@
+import csv
+import math
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+class LogHistogram:
+    """Fixed-memory histogram with logarithmic buckets (HdrHistogram layout).
+
+    Values are counted in multiples of `unit` above `lowest`. The first
+    2 * 2**sub_bucket_bits units get a bucket each; above that every power of
+    two is split into 2**sub_bucket_bits buckets, so any recorded value is
+    known to within a relative error of 2**-sub_bucket_bits of its distance
+    from `lowest`. Values outside [lowest, highest] are clamped. Histograms
+    with the same layout can be merged, e.g. across replications or worker
+    processes.
+    """
+
+    def __init__(self, lowest=0.0, highest=1.0, unit=1e-3, sub_bucket_bits=7):
+        self.lowest = lowest
+        self.highest = highest
+        self.unit = unit
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_buckets = 1 << sub_bucket_bits
+        self.max_units = max(1, int((highest - lowest) / unit))
+        self.counts = np.zeros(self._index(self.max_units) + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, units):
+        if units < 2 * self.sub_buckets:
+            return units
+        shift = units.bit_length() - self.sub_bucket_bits - 1
+        return self.sub_buckets * shift + (units >> shift)
+
+    def _upper(self, index):
+        """Largest value that falls into bucket `index`"""
+        if index < 2 * self.sub_buckets:
+            units = index + 1
+        else:
+            shift = index // self.sub_buckets - 1
+            units = (index - self.sub_buckets * shift + 1) << shift
+        return self.lowest + units * self.unit
+
+    def add(self, value):
+        units = min(max(int((value - self.lowest) / self.unit), 0), self.max_units)
+        self.counts[self._index(units)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def compatible(self, other):
+        return (self.lowest, self.highest, self.unit, self.sub_bucket_bits) == \
+            (other.lowest, other.highest, other.unit, other.sub_bucket_bits)
+
+    def merge(self, other):
+        if not self.compatible(other):
+            raise ValueError("Cannot merge histograms with different bucket layouts")
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def copy(self):
+        clone = LogHistogram(self.lowest, self.highest, self.unit, self.sub_bucket_bits)
+        return clone.merge(self)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        """Value at or below which `p` percent of the recorded values fall"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(p / 100 * self.count))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        # Bucket bounds are approximate; the exact extremes are known
+        return min(max(self._upper(index), self.min), self.max)
+
+
+# Bucket layouts per metric: (lowest, highest, unit, sub_bucket_bits). RSSI and
+# SNR are offset from their floor, so they get finer buckets to stay within ~0.1 dB
+HISTOGRAM_LAYOUTS = {
+    'delay': (0.0, 120.0, 1e-5, 7),  # s
+    'rssi': (-200.0, 30.0, 0.01, 10),  # dBm
+    'snr': (-60.0, 60.0, 0.01, 10),  # dB
+    'airtime': (0.0, 60.0, 1e-5, 7),  # s
+}
+
+
+class PacketHistograms:
+    """Delay, RSSI, SNR and time-on-air histograms per environment and SF"""
+
+    def __init__(self):
+        self.histograms = {}  # (metric, environment, sf) -> LogHistogram
+
+    def _histogram(self, metric, environment, sf):
+        key = (metric, environment, sf)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LogHistogram(*HISTOGRAM_LAYOUTS[metric])
+        return histogram
+
+    def record(self, environment, sf, airtime, rssi, snr, delay=None):
+        """Record one packet; `delay` is only given for delivered packets"""
+        self._histogram('airtime', environment, sf).add(airtime)
+        self._histogram('rssi', environment, sf).add(rssi)
+        self._histogram('snr', environment, sf).add(snr)
+        if delay is not None:
+            self._histogram('delay', environment, sf).add(delay)
+
+    def merge(self, other):
+        for key, histogram in other.histograms.items():
+            if key in self.histograms:
+                self.histograms[key].merge(histogram)
+            else:
+                self.histograms[key] = histogram.copy()
+        return self
+
+    def combined(self, metric, environment=None, sf=None):
+        """One histogram over all entries matching the given environment/SF (None = any)"""
+        result = LogHistogram(*HISTOGRAM_LAYOUTS[metric])
+        for (name, env, spreading_factor), histogram in self.histograms.items():
+            if name == metric and environment in (None, env) and sf in (None, spreading_factor):
+                result.merge(histogram)
+        return result
+
+    def rows(self):
+        """Summary rows per metric/environment/SF, plus an 'all' SF row per environment"""
+        rows = []
+        groups = sorted({(metric, env) for metric, env, _ in self.histograms})
+        for metric, environment in groups:
+            sfs = sorted(sf for name, env, sf in self.histograms if (name, env) == (metric, environment))
+            for sf in sfs + ['all']:
+                histogram = self.combined(metric, environment, None if sf == 'all' else sf)
+                row = {'Metric': metric, 'Environment': environment, 'SF': sf, 'Count': histogram.count,
+                       'Mean': round(histogram.mean, 6)}
+                for p in PERCENTILES:
+                    row[f'p{p}'] = round(histogram.percentile(p), 6)
+                row['Max'] = round(histogram.max, 6) if histogram.count else 0.0
+                rows.append(row)
+        return rows
+
+    def write_csv(self, path):
+        rows = self.rows()
+        headers = ['Metric', 'Environment', 'SF', 'Count', 'Mean'] + [f'p{p}' for p in PERCENTILES] + ['Max']
+        with open(path, mode='w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=headers)
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
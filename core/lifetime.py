@@ -0,0 +1,233 @@
+"""Network lifetime: fast-forward estimation and full-simulation reference.
+
+Usage:
+    estimator = LifetimeEstimator(num_nodes=50, environment="rural", seed=1)
+    curve = estimator.run(fraction=0.5)
+    reference = simulate_lifetime(fraction=0.5, max_time=2 * curve.times[-1], num_nodes=50,
+                                  environment="rural", seed=1)
+    print(compare_lifetimes(curve, reference))
+"""
+import math
+import time
+
+import numpy as np
+
+from core.mobility import STEP_ENERGY
+from core.simulation import LOG_SUMMARY, LoRaMPPSimulation
+
+WARMUP = 60.0  # Simulated seconds of each drain-rate profile
+BURN_IN = 180.0  # Simulated seconds before the first profile, while SF adaptation settles
+SAMPLES = 6  # Sub-windows per profile, for the rate's standard error
+CONFIDENCE_Z = 1.96  # ~95% bounds
+
+
+class LifetimeCurve:
+    """Live node count after each death, with bounds on the time of each step"""
+
+    def __init__(self, total):
+        self.total = total
+        self.times = []
+        self.alive = []
+        self.low = []
+        self.high = []
+
+    def __len__(self):
+        return len(self.times)
+
+    def add(self, at, alive, low=None, high=None):
+        self.times.append(at)
+        self.alive.append(alive)
+        self.low.append(at if low is None else low)
+        self.high.append(at if high is None else high)
+
+    def death_times(self):
+        """(time, low, high) per individual death, in order"""
+        deaths = []
+        previous = self.total
+        for at, alive, low, high in zip(self.times, self.alive, self.low, self.high):
+            deaths.extend([(at, low, high)] * (previous - alive))
+            previous = alive
+        return deaths
+
+    def time_to(self, fraction):
+        """Time at which at least `fraction` of the nodes are dead, or None if it was not reached"""
+        for at, alive in zip(self.times, self.alive):
+            if self.total - alive >= fraction * self.total:
+                return at
+        return None
+
+    def rows(self):
+        return [{'Time (s)': round(at, 3), 'Alive Nodes': alive, 'Time Low (s)': round(low, 3),
+                 'Time High (s)': round(high, 3)}
+                for at, alive, low, high in zip(self.times, self.alive, self.low, self.high)]
+
+
+def _target_deaths(total, fraction):
+    return max(1, math.ceil(fraction * total))
+
+
+class LifetimeEstimator:
+    """Estimates the alive-nodes-over-time curve without simulating every second.
+
+    The network is simulated for a short warm-up split into `samples`
+    sub-windows, which gives each node's mean drain rate (TX, RX, movement
+    and sleep together) and its standard error. Every live node is then
+    drained analytically at that rate up to the next death, the next node
+    to fall below STEP_ENERGY or at most `max_jump` seconds, and the profile
+    is repeated on the changed topology. Positions stay put during a jump;
+    the profiles keep nodes moving. A burn-in is simulated first, since SF
+    adaptation raises the drain over the first minutes of a run.
+
+    The bounds on each step scale the jump by the critical node's rate
+    +/- `confidence_z` standard errors and accumulate over the run.
+    """
+
+    def __init__(self, warmup=WARMUP, samples=SAMPLES, interval=1.0, max_jump=None, burn_in=BURN_IN,
+                 confidence_z=CONFIDENCE_Z, **simulation_args):
+        simulation_args.setdefault('verbosity', LOG_SUMMARY)
+        self.simulation = LoRaMPPSimulation(**simulation_args)
+        self.warmup = warmup
+        self.samples = max(1, samples)
+        self.interval = interval
+        self.max_jump = max_jump
+        self.burn_in = burn_in
+        self.confidence_z = confidence_z
+        self.clock = 0.0  # Virtual time of the network, simulated and jumped
+        self.low = 0.0
+        self.high = 0.0
+        self.simulated = 0.0
+        self.jumps = 0
+        self.wall_time = 0.0
+        self.curve = LifetimeCurve(len(self.simulation.nodes))
+        self._in_window = False
+        self.simulation.node_array.add_death_listener(self._nodes_died)
+
+    def _nodes_died(self, rows):
+        store = self.simulation.node_array
+        elapsed = self.simulation.scheduler.now if self._in_window else 0.0
+        self.curve.add(self.clock + elapsed, int(store.alive.sum()), self.low + elapsed, self.high + elapsed)
+
+    def _advance(self, elapsed, low, high):
+        self.clock += elapsed
+        self.low += low
+        self.high += high
+
+    def _simulate(self, duration):
+        self._in_window = True
+        try:
+            self.simulation.run_with_mobility(duration=duration, interval=self.interval)
+        finally:
+            self._in_window = False
+        # Packets still on the air at the end drain into the window, but the
+        # next window's clock starts at `duration`, so that is all the time that passed
+        self._advance(duration, duration, duration)
+        self.simulated += duration
+        return duration
+
+    def profile(self):
+        """Simulate the warm-up; returns the per-node drain rate (W) and its standard error"""
+        store = self.simulation.node_array
+        span = self.warmup / self.samples
+        rates = np.zeros((self.samples, len(store)))
+        for k in range(self.samples):
+            before = store.energy.copy()
+            elapsed = self._simulate(span)
+            rates[k] = (before - store.energy) / elapsed
+        error = rates.std(axis=0, ddof=1) / math.sqrt(self.samples) if self.samples > 1 else np.zeros(len(store))
+        return rates.mean(axis=0), error
+
+    def jump(self, rate, error, max_time=math.inf):
+        """Drain every live node at `rate` up to the next death; returns the jump length or None"""
+        store = self.simulation.node_array
+        alive = np.flatnonzero(store.alive)
+        draining = alive[rate[alive] > 0]
+        if not len(draining):
+            return None  # Nothing drains any more, so nobody else will die
+
+        remaining = store.energy[draining] / rate[draining]
+        critical = int(np.argmin(remaining))
+        length = min(float(remaining[critical]), max_time - self.clock)
+        # Outdoor nodes stop moving below STEP_ENERGY, which changes their drain; re-profile there
+        energy = store.energy[draining]
+        above = energy > STEP_ENERGY
+        if above.any():
+            length = min(length, float(((energy[above] - STEP_ENERGY) / rate[draining][above]).min()))
+        if self.max_jump is not None:
+            length = min(length, self.max_jump)
+        if length <= 0:
+            return None
+
+        # The critical node's rate uncertainty bounds when its death happens
+        node_rate = rate[draining[critical]]
+        spread = self.confidence_z * error[draining[critical]]
+        low = length * node_rate / (node_rate + spread)
+        high = length * node_rate / (node_rate - spread) if node_rate > spread else math.inf
+        self._advance(length, low, high)
+
+        amount = rate[draining] * length
+        dying = remaining <= length * (1 + 1e-9)
+        amount[dying] = store.energy[draining[dying]]  # No rounding residue on the nodes that die now
+        store.consume_energy(draining, amount)
+        self.jumps += 1
+        return length
+
+    def run(self, fraction=1.0, max_time=math.inf):
+        """Fast-forward until `fraction` of the nodes are dead or `max_time` is reached"""
+        store = self.simulation.node_array
+        target = _target_deaths(len(store), fraction)
+        started = time.time()
+        try:
+            if self.burn_in and self.clock == 0:
+                self._simulate(self.burn_in)
+            while len(store) - int(store.alive.sum()) < target and self.clock < max_time:
+                alive = int(store.alive.sum())
+                rate, error = self.profile()
+                if int(store.alive.sum()) != alive:
+                    continue  # A death during the profile changed the traffic it measured
+                if self.jump(rate, error, max_time) is None:
+                    break
+        finally:
+            self.simulation.close()
+            self.wall_time = time.time() - started
+        return self.curve
+
+
+def simulate_lifetime(fraction=1.0, max_time=86400.0, interval=1.0, **simulation_args):
+    """Reference curve from a full timed run, stopped once `fraction` of the nodes are dead"""
+    simulation_args.setdefault('verbosity', LOG_SUMMARY)
+    simulation = LoRaMPPSimulation(**simulation_args)
+    store = simulation.node_array
+    curve = LifetimeCurve(len(store))
+    target = _target_deaths(len(store), fraction)
+
+    def nodes_died(rows):
+        alive = int(store.alive.sum())
+        curve.add(simulation.scheduler.now, alive)
+        if len(store) - alive >= target:
+            simulation.stop()
+
+    store.add_death_listener(nodes_died)
+    try:
+        simulation.run_with_mobility(duration=max_time, interval=interval)
+    finally:
+        simulation.close()
+    return curve
+
+
+def compare_lifetimes(estimate, reference):
+    """Error of an estimated curve against a reference, death by death"""
+    estimated = estimate.death_times()
+    actual = [at for at, _, _ in reference.death_times()]
+    count = min(len(estimated), len(actual))
+    if not count:
+        return {'Deaths Compared': 0}
+    errors = np.array([estimated[k][0] - actual[k] for k in range(count)])
+    relative = np.abs(errors) / np.maximum(np.array(actual[:count]), 1e-9)
+    covered = sum(bool(estimated[k][1] <= actual[k] <= estimated[k][2]) for k in range(count))
+    return {
+        'Deaths Compared': count,
+        'Mean Abs Error (s)': round(float(np.abs(errors).mean()), 3),
+        'Mean Rel Error (%)': round(float(relative.mean() * 100), 2),
+        'Max Rel Error (%)': round(float(relative.max() * 100), 2),
+        'Within Bounds (%)': round(covered / count * 100, 1),
+    }
@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+
+DENSE_LIMIT = 1024  # Largest network kept as full n x n matrices (16 MB at this size)
+
+
+class LinkBudgetCache:
+    """Distance and mean path loss per node pair, recomputed only after movement.
+
+    Small networks use dense n x n matrices (NaN marks a stale entry); larger
+    ones keep a sparse map of the pairs actually used. Entries are filled on
+    first use and invalidated for the rows and columns of nodes that moved,
+    so random shadowing and fading are the only per-packet channel work left.
+
+    With `tolerance` (metres) a node's entries survive until it is more than
+    that far from where they were last invalidated, so a cached distance is
+    off by at most twice the tolerance per end. The default of 0 drops them
+    on every move, which under per-tick mobility leaves few hits.
+    """
+
+    def __init__(self, channel, positions, dense_limit=DENSE_LIMIT, tolerance=0.0):
+        self.channel = channel
+        self.positions = positions  # Live (n, 2) position array of a NodeArray
+        self.dense = len(positions) <= dense_limit
+        self.tolerance = tolerance
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+        # Cached losses hold the old environment's constants
+        channel.environment_listeners.append(self.clear)
+
+    def clear(self):
+        """Drop every entry; runs automatically when the channel environment changes"""
+        size = len(self.positions)
+        self.anchor = np.array(self.positions, dtype=np.float64)  # Positions the entries were kept for
+        if self.dense:
+            self.distance = np.full((size, size), np.nan)
+            self.loss = np.full((size, size), np.nan)
+        else:
+            self.links = [{} for _ in range(size)]  # row -> {row: (distance, loss)}
+
+    def lookup(self, i, j):
+        """(distance, mean path loss) between nodes i and j"""
+        if self.dense:
+            distance = self.distance[i, j]
+            if distance == distance:  # Not NaN
+                self.hits += 1
+                return float(distance), float(self.loss[i, j])
+        else:
+            link = self.links[i].get(j)
+            if link is not None:
+                self.hits += 1
+                return link
+
+        self.misses += 1
+        x1, y1 = self.positions[i].tolist()
+        x2, y2 = self.positions[j].tolist()
+        distance = math.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2)
+        loss = self.channel.mean_path_loss(distance)
+        if self.dense:
+            self.distance[i, j] = self.distance[j, i] = distance
+            self.loss[i, j] = self.loss[j, i] = loss
+        else:
+            self.links[i][j] = self.links[j][i] = (distance, loss)
+        return distance, loss
+
+    def invalidate(self, rows):
+        """Forget every pair involving the given (moved) rows, once past the tolerance"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.tolerance > 0 and len(rows):
+            offset = self.positions[rows] - self.anchor[rows]
+            rows = rows[np.hypot(offset[:, 0], offset[:, 1]) > self.tolerance]
+        if not len(rows):
+            return
+        self.anchor[rows] = self.positions[rows]
+        if self.dense:
+            self.distance[rows, :] = np.nan
+            self.distance[:, rows] = np.nan
+            return
+        for i in rows.tolist():
+            for j in self.links[i]:
+                self.links[j].pop(i, None)
+            self.links[i] = {}
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,186 @@
+import math
+from collections import deque
+
+import numpy as np
+
+
+class RunningStats:
+    """Streaming count, mean, variance, min and max (Welford's algorithm)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Fold in another RunningStats (Chan et al. parallel update)"""
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class SlidingWindow:
+    """Packet outcomes over the last `window` seconds of virtual time"""
+
+    def __init__(self, window=60.0):
+        self.window = window
+        self.events = deque()  # (time, delivered, payload bits)
+        self.sent = 0
+        self.delivered = 0
+        self.bits = 0
+
+    def add(self, now, delivered, bits):
+        self.events.append((now, delivered, bits))
+        self.sent += 1
+        if delivered:
+            self.delivered += 1
+            self.bits += bits
+        self.expire(now)
+
+    def expire(self, now):
+        # Each event is evicted once, so this is amortised O(1)
+        horizon = now - self.window
+        while self.events and self.events[0][0] <= horizon:
+            _, delivered, bits = self.events.popleft()
+            self.sent -= 1
+            if delivered:
+                self.delivered -= 1
+                self.bits -= bits
+
+    def pdr(self, now):
+        self.expire(now)
+        return self.delivered / self.sent * 100 if self.sent else 0.0
+
+    def throughput(self, now):
+        """Delivered payload in bit/s"""
+        self.expire(now)
+        return self.bits / self.window
+
+
+class MetricsAggregator:
+    """Network totals kept up to date from O(1) deltas.
+
+    Attached to a NodeArray as `store.metrics`: node setters, energy drains
+    and mobility report changes as they happen, and the simulation reports
+    each finished packet. Reading the totals never scans the nodes, so live
+    dashboards can poll snapshot() as often as they like. Code that writes
+    the NodeArray columns directly should call resync() afterwards.
+    """
+
+    def __init__(self, store, window=60.0):
+        self.store = store
+        self.window = SlidingWindow(window)
+        self.delay = RunningStats()  # s, delivered packets only
+        self.sent = 0
+        self.delivered = 0
+        self.collisions = 0
+        self.resync()
+        store.metrics = self
+        store.add_death_listener(self.nodes_died)
+        store.add_revive_listener(self.nodes_revived)
+
+    def resync(self):
+        """Recompute the node-derived totals with one full pass"""
+        store = self.store
+        self.energy_used = float((store.initial_energy - store.energy).sum())
+        self.sf_total = int(store.sf.sum(dtype=np.int64))
+        self.bw_total = int(store.bw.sum(dtype=np.int64))
+        self.indoor_detections = int(store.motion_detected.sum())
+        self.adaptations = int(store.adaptations.sum(dtype=np.int64))
+        self.alive = int(store.alive.sum())
+
+    def reset_packets(self):
+        """Start a new run: clear packet counts and statistics, keep node totals"""
+        self.window = SlidingWindow(self.window.window)
+        self.delay = RunningStats()
+        self.sent = 0
+        self.delivered = 0
+        self.collisions = 0
+
+    # Deltas reported by the node store
+    def energy_consumed(self, amount):
+        self.energy_used += amount
+
+    def sf_changed(self, delta):
+        self.sf_total += delta
+
+    def bw_changed(self, delta):
+        self.bw_total += delta
+
+    def motion_changed(self, delta):
+        self.indoor_detections += delta
+
+    def adapted(self, count=1):
+        self.adaptations += count
+
+    def nodes_died(self, indices):
+        self.alive -= len(indices)
+
+    def nodes_revived(self, indices):
+        self.alive += len(indices)
+
+    def packet(self, now, delivered, delay, payload_len=0, collided=False):
+        """Record a finished packet at virtual time `now`"""
+        self.sent += 1
+        if collided:
+            self.collisions += 1
+        if delivered:
+            self.delivered += 1
+            self.delay.add(delay)
+        self.window.add(now, delivered, 8 * payload_len)
+
+    @property
+    def pdr(self):
+        return self.delivered / self.sent * 100 if self.sent else 0.0
+
+    @property
+    def avg_sf(self):
+        return self.sf_total / len(self.store) if len(self.store) else 0.0
+
+    @property
+    def avg_bw(self):
+        return self.bw_total / len(self.store) if len(self.store) else 0.0
+
+    def snapshot(self, now):
+        """Current totals plus rates over the sliding window ending at `now`"""
+        return {
+            'Packets Sent': self.sent,
+            'Packets Received': self.delivered,
+            'PDR (%)': round(self.pdr, 2),
+            'Avg Delay (ms)': round(self.delay.mean * 1000, 1),
+            'Delay Std (ms)': round(self.delay.std * 1000, 1),
+            'Total Energy Used (J)': round(self.energy_used, 2),
+            'Collisions': self.collisions,
+            'Active Nodes': self.alive,
+            'Avg SF': round(self.avg_sf, 2),
+            'Avg BW (kHz)': round(self.avg_bw, 2),
+            'Window PDR (%)': round(self.window.pdr(now), 2),
+            'Window Throughput (bit/s)': round(self.window.throughput(now), 1),
+        }
@@ -0,0 +1,53 @@
+import numpy as np
+
+MOVE_ENERGY = 0.005  # Joules per step for outdoor nodes
+STEP_ENERGY = 20  # Joules of remaining energy per metre of an outdoor node's largest step
+
+
+def move_nodes(nodes, area_size, environment, rng):
+    """Move every live node of a NodeArray in one batch.
+
+    Whole-population version of LoRaNode.move: same step_max rule, area
+    clamping, motion detection and movement energy, drawn from `rng` in bulk.
+    Returns the row indices of the nodes whose position actually changed.
+    """
+    indoor = environment.lower() == "indoor"
+
+    # Environment-specific movement patterns
+    if indoor:
+        # Indoor nodes move in smaller steps
+        step_max = np.where(nodes.alive, 2, 0)
+    else:
+        step_max = np.minimum(5, (nodes.energy / STEP_ENERGY).astype(np.int64))
+        step_max[~nodes.alive] = 0  # Dead nodes don't move
+
+    moving = np.flatnonzero(step_max >= 1)
+    if not len(moving):
+        return moving
+    step_max = step_max[moving]
+
+    steps = np.empty((len(moving), 2), dtype=np.int64)
+    steps[:, 0] = rng.integers(-step_max, step_max, endpoint=True)
+    steps[:, 1] = rng.integers(-step_max, step_max, endpoint=True)
+
+    old = nodes.position[moving]
+    new = np.clip(old + steps, 0, area_size)
+    nodes.position[moving] = new
+
+    # Detect motion patterns: small, irregular movements = indoor
+    detected_before = int(nodes.motion_detected[moving].sum()) if nodes.metrics is not None else 0
+    if environment == "indoor":
+        distance_moved = np.hypot(new[:, 0] - old[:, 0], new[:, 1] - old[:, 1])
+        nodes.motion_detected[moving] = ((distance_moved > 0.2) & (distance_moved < 3.0) &
+                                         (rng.random(len(moving)) > 0.7))
+    else:
+        nodes.motion_detected[moving] = False
+    if nodes.metrics is not None:
+        nodes.metrics.motion_changed(int(nodes.motion_detected[moving].sum()) - detected_before)
+
+    # Only consume energy for movement in outdoor environments
+    if not indoor:
+        nodes.consume_energy(moving, MOVE_ENERGY)
+
+    # A zero step (or one clamped at the border) leaves the node where it was
+    return moving[np.any(new != old, axis=1)]
@@ -1,15 +1,54 @@
-import random
 import math
 import time
 from collections import deque
 
+import numpy as np
+
+from core.airtime import AIRTIME
 from core.energy_model import EnergyModel
+from core.node_array import NodeArray
+from core.packet import Packet
+
+# Fallback for nodes created outside a simulation
+_default_rng = np.random.default_rng()
+
+# Packet retention policies for packet_queue / received_packets
+RETAIN_COUNTERS = 'counters'  # Keep counters only (constant memory)
+RETAIN_RING = 'ring'  # Keep the most recent `ring_size` packets
+RETAIN_FULL = 'full'  # Keep every packet in memory
+RETENTION_POLICIES = (RETAIN_COUNTERS, RETAIN_RING, RETAIN_FULL)
+
+
+def _packet_store(retention, ring_size):
+    if retention == RETAIN_COUNTERS:
+        return None
+    if retention == RETAIN_RING:
+        return deque(maxlen=ring_size)
+    if retention == RETAIN_FULL:
+        return []
+    raise ValueError(f"Unknown packet retention policy: {retention}")
 
 
 class LoRaNode:
+    """A single node, stored as one row of a NodeArray.
+
+    Nodes created on their own get a private one-row store; the simulation
+    creates all of its nodes as views into one shared NodeArray.
+
+    `retention` decides what happens to packet copies: counters only (the
+    default, packet_queue and received_packets are None), a ring of the last
+    `ring_size` packets, or the full history.
+    """
+    __slots__ = ('store', 'index', 'node_id', 'environment', '_energy_model', 'packet_queue', 'received_packets',
+                 'rng')
+
     def __init__(self, node_id=None, position=(0, 0), tx_power=14, sf=7, cr=1, bw=125, energy=100.0,
-                 environment="urban"):
-        self.node_id = node_id or f"Node{random.randint(1000, 9999)}"
+                 environment="urban", store=None, index=0, rng=None, retention=RETAIN_COUNTERS, ring_size=16):
+        self.store = store if store is not None else NodeArray(1)
+        self.index = index
+        # Mobility generator; simulation nodes share the simulation's mobility stream
+        self.rng = rng if rng is not None else _default_rng
+        self.node_id = node_id or f"Node{self.rng.integers(1000, 9999, endpoint=True)}"
         self.position = position
         self.tx_power = tx_power
         self.spreading_factor = sf
@@ -17,35 +56,144 @@ class LoRaNode:
         self.bandwidth = bw
         self.energy = energy
         self.initial_energy = energy  # Track initial energy for consumption calculation
-        self.packet_queue = deque()
-        self.received_packets = []
+        self.packet_queue = _packet_store(retention, ring_size)
+        self.received_packets = _packet_store(retention, ring_size)
         self.transmitted_packets = 0
         self.received_packets_count = 0
-        self.energy_model = EnergyModel()
-        self.current_state = 'IDLE'
+        self._energy_model = None  # Created on first use; nodes charged by an EnergyLedger never need one
         self.environment = environment
         self.motion_detected = False
         self.adaptation_counter = 0  # Track how many times parameters have been adapted
 
-    def transmit_packet(self, destination_id, payload):
+    @property
+    def energy_model(self):
+        if self._energy_model is None:
+            self._energy_model = EnergyModel()
+        return self._energy_model
+
+    @property
+    def current_state(self):
+        return self.energy_model.current_state
+
+    # Row accessors into the shared NodeArray
+    @property
+    def position(self):
+        x, y = self.store.position[self.index]
+        return float(x), float(y)
+
+    @position.setter
+    def position(self, value):
+        self.store.position[self.index] = value
+
+    @property
+    def energy(self):
+        return float(self.store.energy[self.index])
+
+    @energy.setter
+    def energy(self, value):
+        self.store.set_energy(self.index, value)
+
+    @property
+    def initial_energy(self):
+        return float(self.store.initial_energy[self.index])
+
+    @initial_energy.setter
+    def initial_energy(self, value):
+        self.store.initial_energy[self.index] = value
+
+    @property
+    def tx_power(self):
+        return int(self.store.tx_power[self.index])
+
+    @tx_power.setter
+    def tx_power(self, value):
+        self.store.tx_power[self.index] = value
+
+    @property
+    def spreading_factor(self):
+        return int(self.store.sf[self.index])
+
+    @spreading_factor.setter
+    def spreading_factor(self, value):
+        if self.store.metrics is not None:
+            self.store.metrics.sf_changed(int(value) - int(self.store.sf[self.index]))
+        self.store.sf[self.index] = value
+
+    @property
+    def bandwidth(self):
+        return int(self.store.bw[self.index])
+
+    @bandwidth.setter
+    def bandwidth(self, value):
+        if self.store.metrics is not None:
+            self.store.metrics.bw_changed(int(value) - int(self.store.bw[self.index]))
+        self.store.bw[self.index] = value
+
+    @property
+    def coding_rate(self):
+        return int(self.store.cr[self.index])
+
+    @coding_rate.setter
+    def coding_rate(self, value):
+        self.store.cr[self.index] = value
+
+    @property
+    def motion_detected(self):
+        return bool(self.store.motion_detected[self.index])
+
+    @motion_detected.setter
+    def motion_detected(self, value):
+        if self.store.metrics is not None:
+            self.store.metrics.motion_changed(int(value) - int(self.store.motion_detected[self.index]))
+        self.store.motion_detected[self.index] = value
+
+    @property
+    def transmitted_packets(self):
+        return int(self.store.transmitted[self.index])
+
+    @transmitted_packets.setter
+    def transmitted_packets(self, value):
+        self.store.transmitted[self.index] = value
+
+    @property
+    def received_packets_count(self):
+        return int(self.store.received[self.index])
+
+    @received_packets_count.setter
+    def received_packets_count(self, value):
+        self.store.received[self.index] = value
+
+    @property
+    def adaptation_counter(self):
+        return int(self.store.adaptations[self.index])
+
+    @adaptation_counter.setter
+    def adaptation_counter(self, value):
+        if self.store.metrics is not None:
+            self.store.metrics.adapted(int(value) - int(self.store.adaptations[self.index]))
+        self.store.adaptations[self.index] = value
+
+    def transmit_packet(self, destination_id, payload_len, now=None):
+        """Queue a `payload_len`-byte packet stamped with virtual time `now` (wall clock if omitted)"""
         if self.energy <= 0:
             return None
 
-        packet = {
-            'src': self.node_id,
-            'dst': destination_id,
-            'payload': payload,
-            'sf': self.spreading_factor,
-            'bw': self.bandwidth,
-            'cr': self.coding_rate,
-            'timestamp': time.time()
-        }
-
-        # Consume energy for transmission
-        energy_used = self.energy_model.calculate_energy('TX', 0.1)
-        self.consume_energy(energy_used)
-
-        self.packet_queue.append(packet)
+        sf, bw, cr = self.spreading_factor, self.bandwidth, self.coding_rate
+        airtime = AIRTIME.lookup(sf, bw, cr, payload_len)
+        packet = Packet(self.node_id, destination_id, payload_len, time.time() if now is None else now, sf, bw, cr,
+                        airtime=airtime)
+
+        # Consume energy for transmission over the packet's time on air
+        ledger = self.store.ledger
+        if ledger is not None:
+            start = now if now is not None else ledger.settled_at  # The ledger runs on virtual time
+            ledger.record(self.index, 'TX', start, start + airtime)
+        else:
+            energy_used = self.energy_model.calculate_energy('TX', airtime)
+            self.consume_energy(energy_used)
+
+        if self.packet_queue is not None:
+            self.packet_queue.append(packet)
         self.transmitted_packets += 1
         return packet
 
@@ -53,11 +201,15 @@ class LoRaNode:
         if self.energy <= 0:
             return False
 
-        # Consume energy for reception
-        energy_used = self.energy_model.calculate_energy('RX', 0.05)
-        self.consume_energy(energy_used)
+        # Consume energy for reception, listening for the packet's time on air.
+        # With a ledger, listening time was recorded when the packet went on air
+        if self.store.ledger is None:
+            airtime = packet.airtime if packet.airtime is not None else 0.05
+            energy_used = self.energy_model.calculate_energy('RX', airtime)
+            self.consume_energy(energy_used)
 
-        self.received_packets.append(packet)
+        if self.received_packets is not None:
+            self.received_packets.append(packet)
         self.received_packets_count += 1
         return True
 
@@ -84,8 +236,7 @@ class LoRaNode:
         if step_max < 1:
             return
 
-        dx = random.randint(-step_max, step_max)
-        dy = random.randint(-step_max, step_max)
+        dx, dy = self.rng.integers(-step_max, step_max, size=2, endpoint=True).tolist()
         x, y = self.position
         new_x = max(0, min(area_size, x + dx))
         new_y = max(0, min(area_size, y + dy))
@@ -97,7 +248,7 @@ class LoRaNode:
 
         # Detect motion patterns: small, irregular movements = indoor
         self.motion_detected = (distance_moved > 0.2 and distance_moved < 3.0 and
-                                random.random() > 0.7 and environment == "indoor")
+                                self.rng.random() > 0.7 and environment == "indoor")
 
         # Only consume energy for movement in outdoor environments
         if environment.lower() != "indoor":
@@ -0,0 +1,82 @@
+import numpy as np
+
+
+class NodeArray:
+    """Columnar (structure-of-arrays) store for the state of every node.
+
+    Each attribute is one contiguous NumPy array indexed by node row, so
+    mobility, energy drain and metrics can run as whole-array operations.
+    LoRaNode objects are thin views onto a single row.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.position = np.zeros((size, 2), dtype=np.float32)  # metres
+        self.energy = np.zeros(size, dtype=np.float64)  # Joules
+        self.initial_energy = np.zeros(size, dtype=np.float64)
+        self.tx_power = np.full(size, 14, dtype=np.int8)  # dBm
+        self.sf = np.full(size, 7, dtype=np.int8)
+        self.bw = np.full(size, 125, dtype=np.int16)  # kHz
+        self.cr = np.ones(size, dtype=np.int8)  # 1..4 -> 4/5..4/8
+        self.alive = np.zeros(size, dtype=bool)
+        self.motion_detected = np.zeros(size, dtype=bool)
+        self.transmitted = np.zeros(size, dtype=np.uint32)
+        self.received = np.zeros(size, dtype=np.uint32)
+        self.adaptations = np.zeros(size, dtype=np.uint32)
+        self.death_listeners = []
+        self.revive_listeners = []
+        self.metrics = None  # Optional MetricsAggregator told about every change
+        self.ledger = None  # Optional EnergyLedger charging radio time; per-packet charges are skipped
+
+    def __len__(self):
+        return self.size
+
+    def add_death_listener(self, callback):
+        """Register callback(indices) to be told when nodes run out of energy"""
+        self.death_listeners.append(callback)
+
+    def add_revive_listener(self, callback):
+        """Register callback(indices) to be told when dead nodes get energy again"""
+        self.revive_listeners.append(callback)
+
+    def set_energy(self, index, value):
+        if self.metrics is not None:
+            self.metrics.energy_consumed(float(self.energy[index]) - value)
+        self.energy[index] = value
+        alive = value > 0
+        was_alive = self.alive[index]
+        self.alive[index] = alive
+        if was_alive and not alive:
+            self._notify_deaths(np.array([index]))
+        elif alive and not was_alive:
+            for callback in self.revive_listeners:
+                callback(np.array([index]))
+
+    def consume_energy(self, indices, amount):
+        """Drain `amount` (scalar or per-row array) from the given rows.
+
+        `indices` is an array of distinct row numbers or a boolean mask.
+        """
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        remaining = np.maximum(0.0, self.energy[indices] - amount)
+        if self.metrics is not None:
+            self.metrics.energy_consumed(float((self.energy[indices] - remaining).sum()))
+        self.energy[indices] = remaining
+
+        died = indices[self.alive[indices] & (remaining <= 0)]
+        self.alive[indices] = remaining > 0
+        if len(died):
+            self._notify_deaths(died)
+        return remaining
+
+    def _notify_deaths(self, indices):
+        for callback in self.death_listeners:
+            callback(indices)
+
+    def energy_used(self):
+        return float(np.maximum(0.0, self.initial_energy - self.energy).sum())
+
+    def nbytes(self):
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
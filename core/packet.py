@@ -0,0 +1,28 @@
+class Packet:
+    """A delivered or queued packet.
+
+    Plain slotted record instead of a per-packet dict; the payload itself is
+    never materialised, only its length in bytes (which is all the airtime
+    and energy models need).
+    """
+    __slots__ = ('src', 'dst', 'payload_len', 'timestamp', 'sf', 'bw', 'cr', 'rssi', 'snr', 'distance', 'delay',
+                 'airtime')
+
+    def __init__(self, src, dst, payload_len, timestamp, sf, bw, cr, rssi=None, snr=None, distance=None, delay=None,
+                 airtime=None):
+        self.src = src
+        self.dst = dst
+        self.payload_len = payload_len
+        self.timestamp = timestamp  # virtual time (s)
+        self.sf = sf
+        self.bw = bw
+        self.cr = cr
+        self.rssi = rssi
+        self.snr = snr
+        self.distance = distance
+        self.delay = delay
+        self.airtime = airtime
+
+    def __repr__(self):
+        return (f"Packet({self.src} → {self.dst}, {self.payload_len} B, SF{self.sf}/{self.bw}kHz, "
+                f"t={self.timestamp:.3f}s)")
@@ -1,34 +1,70 @@
 import math
-import random
+
+import numpy as np
+
+from core.airtime import AIRTIME
+from core.collision import CAPTURE_THRESHOLD, InterferenceIndex, Transmission
+from core.packet import Packet
+
 
 class LoRaMPPProtocol:
-    def __init__(self, nodes, channel, energy_model, adaptive=True):
+    def __init__(self, nodes, channel, energy_model, adaptive=True, delivery_rng=None, airtime=None,
+                 capture_threshold=CAPTURE_THRESHOLD, link_cache=None, ledger=None):
         self.nodes = {node.node_id: node for node in nodes}
+        self.airtime = airtime or AIRTIME
+        self.delivery_rng = delivery_rng if delivery_rng is not None else np.random.default_rng()
         self.channel = channel
         self.energy_model = energy_model
         self.collisions = 0
         self.adaptive = adaptive
-        self.active_transmissions = set()
+        self.capture_threshold = capture_threshold
+        self.interference = InterferenceIndex()
+        self.on_air = {}  # Node row -> its latest Transmission; radios are half-duplex
+        self.link_cache = link_cache  # Optional LinkBudgetCache over the nodes' store rows
+        self.ledger = ledger  # Optional EnergyLedger; without one energy is charged per packet
+
+    def clear_air(self):
+        """Forget every transmission, e.g. when the virtual clock restarts for a new run"""
+        self.interference = InterferenceIndex()
+        self.on_air = {}
+
+    def transmitting(self, node, now):
+        """Whether `node` still has a packet on the air at virtual time `now`"""
+        latest = self.on_air.get(node.index)
+        return latest is not None and latest.end > now
+
+    def _transmitted_during(self, node, transmission):
+        latest = self.on_air.get(node.index)
+        return latest is not None and latest.start < transmission.end and latest.end > transmission.start
+
+    def send_message(self, src_id, dst_id, payload_len, now=0.0):
+        """Send a `payload_len`-byte packet starting at `now` and resolve it immediately"""
+        transmission = self.begin_transmission(src_id, dst_id, payload_len, now)
+        if transmission is None:
+            return False, 0
+        return self.end_transmission(transmission)
+
+    def begin_transmission(self, src_id, dst_id, payload_len, now):
+        """Put a packet on the air at virtual time `now`.
 
-    def send_message(self, src_id, dst_id, payload):
+        Returns the Transmission, to be passed to end_transmission() once its
+        airtime has elapsed, or None if the packet could not be sent.
+        """
         try:
             src = self.nodes.get(src_id)
             dst = self.nodes.get(dst_id)
 
             if not src or not dst or src.energy <= 0 or dst.energy <= 0:
-                return False, 0
-
-            # Check for collision
-            if self._check_collision(src_id):
-                self.collisions += 1
-                tx_energy = self.energy_model.calculate_energy("TX", 0.05)
-                src.consume_energy(tx_energy)
-                return False, 0.05
+                return None
 
-            distance = self._calculate_distance(src.position, dst.position)
+            if self.link_cache is not None:
+                distance, mean_loss = self.link_cache.lookup(src.index, dst.index)
+            else:
+                distance, mean_loss = self._calculate_distance(src.position, dst.position), None
 
             # Get signal quality for adaptation
-            signal_quality = self.channel.simulate_link(src.tx_power, distance)
+            shadowing = self.channel.link_shadowing(src.position, dst.position)
+            signal_quality = self.channel.simulate_link(src.tx_power, distance, mean_loss, shadowing)
 
             # Apply adaptive parameter tuning if enabled
             if self.adaptive:
@@ -38,41 +74,60 @@ class LoRaMPPProtocol:
                     src.motion_detected
                 )
 
-            # Transmission time based on LoRa parameters
-            symbol_time = (2 ** src.spreading_factor) / (src.bandwidth / 1000)  # ms
-            payload_symbols = max(8, math.ceil((len(payload) * 8) / (4 * src.spreading_factor)))
-            transmission_time = (payload_symbols + 8.25) * symbol_time / 1000  # seconds
-
-            # Add to active transmissions
-            self.active_transmissions.add(src_id)
-
-            # Simulate propagation delay
-            propagation_delay = distance / (3e8 * 0.7)  # 70% of light speed
-            total_delay = transmission_time + propagation_delay
-
-            # Check if packet is delivered
-            delivery_success = self._packet_delivered(signal_quality, distance)
-
-            # Remove from active transmissions
-            self.active_transmissions.remove(src_id)
-
-            if delivery_success:
-                dst.receive_packet({
-                    'src': src_id,
-                    'dst': dst_id,
-                    'payload': payload,
-                    'rssi': signal_quality['rssi'],
-                    'snr': signal_quality['snr'],
-                    'distance': distance,
-                    'delay': total_delay
-                })
-                return True, total_delay
-            else:
-                return False, total_delay
+            # Time on air for the (possibly adapted) LoRa parameters
+            transmission_time = self.airtime.lookup(src.spreading_factor, src.bandwidth, src.coding_rate,
+                                                    payload_len)
+
+            transmission = Transmission(src, dst, payload_len, now, now + transmission_time, self.channel.frequency,
+                                        src.spreading_factor, src.tx_power, distance, signal_quality,
+                                        src.bandwidth, src.coding_rate)
+            for other in self.interference.add(transmission):
+                self._resolve_capture(transmission, other)
+            self.on_air[src.index] = transmission
+
+            # The sender transmits and the receiver, unless it is transmitting itself, listens
+            # for the whole time on air
+            if self.ledger is not None:
+                self.ledger.record(src.index, 'TX', now, transmission.end)
+                if not self.transmitting(dst, now):
+                    self.ledger.record(dst.index, 'RX', now, transmission.end)
+            return transmission
 
         except Exception as e:
             print("Protocol Error:", str(e))
-            return False, 0
+            return None
+
+    def end_transmission(self, transmission):
+        """Resolve a packet whose airtime has ended; returns (success, delay)"""
+        src = transmission.src
+        dst = transmission.dst
+        transmission_time = transmission.airtime
+
+        if transmission.collided:
+            self.collisions += 1
+            if self.ledger is None:
+                tx_energy = self.energy_model.calculate_energy("TX", transmission_time)
+                src.consume_energy(tx_energy)
+            return False, transmission_time
+
+        # Simulate propagation delay
+        distance = transmission.distance
+        propagation_delay = distance / (3e8 * 0.7)  # 70% of light speed
+        total_delay = transmission_time + propagation_delay
+
+        # Check if packet is delivered
+        signal_quality = transmission.signal_quality
+        # A receiver that transmitted during the packet missed it
+        delivery_success = (dst.energy > 0 and not self._transmitted_during(dst, transmission) and
+                            self._packet_delivered(signal_quality, distance))
+
+        if delivery_success:
+            dst.receive_packet(Packet(src.node_id, dst.node_id, transmission.payload_len, transmission.start,
+                                      transmission.sf, transmission.bw, transmission.cr, signal_quality['rssi'],
+                                      signal_quality['snr'], distance, total_delay, transmission_time))
+            return True, total_delay
+        else:
+            return False, total_delay
 
     def _calculate_distance(self, pos1, pos2):
         x1, y1 = pos1
@@ -86,9 +141,20 @@ class LoRaMPPProtocol:
 
         # Distance penalty
         distance_penalty = min(1, max(0, 1 - (distance / 1000)))
-        return random.random() < base_prob * distance_penalty
-
-    def _check_collision(self, node_id):
-        # Simple collision model - 10% chance per concurrent transmission
-        collision_prob = 0.1 * len(self.active_transmissions)
-        return random.random() < collision_prob
\ No newline at end of file
+        return self.delivery_rng.random() < base_prob * distance_penalty
+
+    def _interference_power(self, interferer, victim):
+        """Mean power of `interferer` at the receiver of `victim`"""
+        distance = self._calculate_distance(interferer.src_position, victim.dst_position)
+        return interferer.tx_power - self.channel.mean_path_loss(distance)
+
+    def _resolve_capture(self, new, other):
+        # Capture effect: a packet survives an overlap only if it is received
+        # at least capture_threshold dB above the interferer, otherwise it is lost.
+        # Packets already lost need no further checks.
+        if not new.collided and (new.signal_quality['rssi'] - self._interference_power(other, new)
+                                 < self.capture_threshold):
+            new.collided = True
+        if not other.collided and (other.signal_quality['rssi'] - self._interference_power(new, other)
+                                   < self.capture_threshold):
+            other.collided = True
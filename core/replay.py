@@ -0,0 +1,288 @@
+import bisect
+import pickle
+import zlib
+from array import array
+
+import numpy as np
+
+from core.checkpoint import snapshot
+from core.rng import STREAMS, RandomStreams
+from core.simulation import LoRaMPPSimulation
+
+MAGIC = b'LRREPLAY1\n'
+SNAPSHOT_EVERY = 10000  # Events between embedded state snapshots
+
+
+class Tape:
+    """Ordered record of every value drawn from one random stream.
+
+    Scalars and arrays are packed into flat int64/float64 columns, so a long
+    run costs a few bytes per draw rather than one Python object each.
+    """
+
+    def __init__(self):
+        self.is_float = array('b')
+        self.sizes = array('q')  # -1 for a scalar
+        self.shapes = {}  # entry -> shape, for arrays that are not 1-D
+        self.ints = array('q')
+        self.floats = array('d')
+        self._offsets = None
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def append(self, value):
+        self._offsets = None
+        value = np.asarray(value)
+        is_float = value.dtype.kind == 'f'
+        column = self.floats if is_float else self.ints
+        self.is_float.append(is_float)
+        if value.ndim == 0:
+            self.sizes.append(-1)
+            column.append(value.item())
+            return
+        if value.ndim != 1:
+            self.shapes[len(self.sizes)] = value.shape
+        self.sizes.append(value.size)
+        column.frombytes(value.astype(np.float64 if is_float else np.int64).tobytes())
+
+    def _index(self):
+        # Start of every entry within its column
+        sizes = np.frombuffer(self.sizes, dtype=np.int64) if len(self.sizes) else np.empty(0, dtype=np.int64)
+        is_float = np.frombuffer(self.is_float, dtype=np.int8).astype(bool)
+        lengths = np.where(sizes < 0, 1, sizes)
+        offsets = np.empty(len(sizes), dtype=np.int64)
+        for mask in (is_float, ~is_float):
+            counts = lengths[mask]
+            offsets[mask] = np.cumsum(counts) - counts
+        self._offsets = offsets
+        self._ints = np.frombuffer(self.ints, dtype=np.int64) if len(self.ints) else np.empty(0, dtype=np.int64)
+        self._floats = np.frombuffer(self.floats, dtype=np.float64) if len(self.floats) else np.empty(0)
+
+    def read(self, entry):
+        if self._offsets is None:
+            self._index()
+        is_float = self.is_float[entry]
+        size = self.sizes[entry]
+        start = self._offsets[entry]
+        column = self._floats if is_float else self._ints
+        if size < 0:
+            return float(column[start]) if is_float else np.int64(column[start])
+        values = column[start:start + size].copy()
+        shape = self.shapes.get(entry)
+        return values.reshape(shape) if shape is not None else values
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('_offsets', '_ints', '_floats'):
+            state.pop(name, None)
+        state['_offsets'] = None
+        return state
+
+
+class TapeGenerator:
+    """Stands in for a NumPy Generator.
+
+    In recording mode every draw is taken from `rng` and appended to the
+    tape; in replay mode (`rng` is None) draws are read back from the tape in
+    order and nothing is generated. Pickling keeps only the stream name and
+    position, so simulation snapshots stay small and always restore into
+    replay mode.
+    """
+
+    def __init__(self, name, tape, rng=None):
+        self.name = name
+        self.tape = tape
+        self.rng = rng
+        self.position = 0
+
+    def _draw(self, method, args, kwargs):
+        if self.rng is not None:
+            value = getattr(self.rng, method)(*args, **kwargs)
+            self.tape.append(value)
+        else:
+            if self.position >= len(self.tape):
+                raise RuntimeError(f"Replay ran past the end of the recorded '{self.name}' stream")
+            value = self.tape.read(self.position)
+        self.position += 1
+        return value
+
+    def integers(self, *args, **kwargs):
+        return self._draw('integers', args, kwargs)
+
+    def random(self, *args, **kwargs):
+        return self._draw('random', args, kwargs)
+
+    def uniform(self, *args, **kwargs):
+        return self._draw('uniform', args, kwargs)
+
+    def normal(self, *args, **kwargs):
+        return self._draw('normal', args, kwargs)
+
+    def standard_normal(self, *args, **kwargs):
+        return self._draw('standard_normal', args, kwargs)
+
+    def __getstate__(self):
+        return {'name': self.name, 'tape': None, 'rng': None, 'position': self.position}
+
+
+class TapeStreams(RandomStreams):
+    """RandomStreams whose generators record to, or replay from, per-stream tapes"""
+
+    def __init__(self, seed=None, tapes=None):
+        super().__init__(seed)
+        replay = tapes is not None
+        self.tapes = tapes if replay else {name: Tape() for name in STREAMS}
+        for name in STREAMS:
+            setattr(self, name, TapeGenerator(name, self.tapes[name], None if replay else getattr(self, name)))
+
+    def attach(self, tapes):
+        """Reconnect generators restored from a snapshot to the recorded tapes"""
+        self.tapes = tapes
+        for name in STREAMS:
+            getattr(self, name).tape = tapes[name]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['tapes'] = None
+        return state
+
+
+class Recording:
+    """Everything needed to re-execute a run without drawing random numbers:
+    the seed, the run arguments, the tape of every stream, the (time, kind)
+    of every processed event, where the run was stopped if it was, and
+    periodic compressed state snapshots."""
+
+    def __init__(self, seed, simulation_args, run_args, tapes):
+        self.seed = seed
+        self.simulation_args = simulation_args
+        self.run_args = run_args
+        self.tapes = tapes
+        self.stopped_at = None  # Events processed before a manual stop, None if the run completed
+        self.event_times = array('d')
+        self.event_kinds = array('b')
+        self.snapshot_events = []  # Event index of each snapshot, ascending
+        self.snapshots = []  # zlib-compressed pickles
+
+    def __len__(self):
+        return len(self.event_times)
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(MAGIC)
+            file.write(zlib.compress(pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)))
+        return path
+
+
+def load_recording(path):
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a simulation recording")
+        return pickle.loads(zlib.decompress(file.read()))
+
+
+class Recorder:
+    """Runs a simulation that records its random draws and event stream.
+
+    Usage:
+        recorder = Recorder(num_nodes=50, seed=1)
+        recorder.run_with_mobility(duration=600)
+        recorder.recording.save("run.lrrec")
+
+    A snapshot of the full state is embedded every `snapshot_every` events
+    (timed runs only) so a replay can seek without starting from zero.
+    """
+
+    def __init__(self, snapshot_every=SNAPSHOT_EVERY, **simulation_args):
+        self.snapshot_every = snapshot_every
+        streams = TapeStreams(simulation_args.pop('seed', None))
+        self.simulation = LoRaMPPSimulation(streams=streams, **simulation_args)
+        self.simulation.event_hook = self._before_event
+        # GUI hooks are not part of the model and cannot be saved
+        saved_args = {key: value for key, value in simulation_args.items() if key not in ('logger', 'visualizer')}
+        self.recording = Recording(streams.seed, saved_args, {}, streams.tapes)
+
+    def run_with_mobility(self, duration=10, interval=1, **kwargs):
+        self.recording.run_args = {'duration': duration, 'interval': interval}
+        try:
+            return self.simulation.run_with_mobility(duration=duration, interval=interval, **kwargs)
+        finally:
+            if not self.simulation.running:
+                self._stopped()
+
+    def _stopped(self):
+        # A stop between the hook and the event leaves that event recorded but not run
+        recording = self.recording
+        recording.stopped_at = self.simulation.scheduler.events_processed
+        del recording.event_times[recording.stopped_at:]
+        del recording.event_kinds[recording.stopped_at:]
+
+    def run(self, num_messages=5):
+        self.recording.run_args = {'num_messages': num_messages}
+        return self.simulation.run(num_messages=num_messages)
+
+    def _before_event(self, scheduler):
+        recording = self.recording
+        index = scheduler.events_processed
+        if index % self.snapshot_every == 0:
+            # Snapshots leave the trace file alone; restoring one must not touch it
+            simulation = self.simulation
+            trace, simulation.trace = simulation.trace, None
+            recording.snapshot_events.append(index)
+            recording.snapshots.append(zlib.compress(snapshot(simulation)))
+            simulation.trace = trace
+        at, kind = scheduler.queue[0][:2]
+        recording.event_times.append(at)
+        recording.event_kinds.append(kind)
+
+
+class Replayer:
+    """Re-executes a Recording from its tapes, with seeking by event index"""
+
+    def __init__(self, recording):
+        self.recording = recording
+        self.simulation = None
+
+    def _restore(self, position):
+        state = pickle.loads(zlib.decompress(self.recording.snapshots[position]))
+        state.streams.attach(self.recording.tapes)
+        state.event_hook = self._check_event
+        return state
+
+    def replay(self):
+        """Re-run the whole recording; returns the final metrics"""
+        streams = TapeStreams(self.recording.seed, self.recording.tapes)
+        args = dict(self.recording.simulation_args, trace_path=None)
+        self.simulation = LoRaMPPSimulation(streams=streams, **args)
+        self.simulation.event_hook = self._check_event
+        if 'num_messages' in self.recording.run_args:
+            return self.simulation.run(**self.recording.run_args)
+        self.simulation.run_with_mobility(**self.recording.run_args)
+        return self.simulation.get_metrics()
+
+    def seek(self, event_index):
+        """Simulation state just before event `event_index` runs (timed runs)"""
+        if 'num_messages' in self.recording.run_args:
+            raise ValueError("Message-mode recordings have no events to seek to; replay them whole")
+        if not self.recording.snapshots:
+            raise ValueError("This recording has no snapshots to seek from")
+        event_index = max(0, min(event_index, len(self.recording)))
+        position = bisect.bisect_right(self.recording.snapshot_events, event_index) - 1
+        self.simulation = self._restore(position)
+        return self.step(event_index - self.recording.snapshot_events[position])
+
+    def step(self, count=1):
+        """Advance the current simulation by `count` events"""
+        self.simulation.scheduler.run(max_events=count, before_event=self._check_event)
+        return self.simulation
+
+    def _check_event(self, scheduler):
+        index = scheduler.events_processed
+        if index == self.recording.stopped_at:
+            self.simulation.stop()  # The recorded run was stopped here
+            return
+        at, kind = scheduler.queue[0][:2]
+        if index >= len(self.recording) or (self.recording.event_times[index], self.recording.event_kinds[index]) != (
+                at, kind):
+            raise RuntimeError(f"Replay diverged from the recording at event {index}")
@@ -0,0 +1,26 @@
+import numpy as np
+
+# One independent substream per source of randomness, so changing how one
+# part of the model draws numbers does not shift the draws of the others
+STREAMS = ("placement", "mobility", "shadowing", "fading", "collisions", "delivery", "traffic")
+
+
+class RandomStreams:
+    """Seeded NumPy generators for one simulation, split into named substreams.
+
+    `seed` may be an int, a sequence of ints or a SeedSequence; None draws
+    fresh entropy, which is kept in `seed` so the run can be reproduced.
+    """
+
+    def __init__(self, seed=None):
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        self.seed = self.seed_sequence.entropy
+
+        for name, child in zip(STREAMS, self.seed_sequence.spawn(len(STREAMS))):
+            setattr(self, name, np.random.default_rng(child))
+
+    def __getitem__(self, name):
+        return getattr(self, name)
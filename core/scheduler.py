@@ -0,0 +1,84 @@
+import heapq
+import time
+
+
+class EventScheduler:
+    """Discrete-event scheduler that advances a virtual clock"""
+
+    # Event kinds; at equal timestamps lower values are processed first
+    PACKET_END = 0
+    ENERGY_UPDATE = 1
+    NODE_MOVE = 2
+    PACKET_START = 3
+    CHECKPOINT = 4
+
+    def __init__(self, start_time=0.0):
+        self.now = start_time
+        self.running = False
+        self.queue = []
+        self.events_processed = 0
+        self._seq = 0  # Tie-breaker keeping insertion order (a plain int so the queue pickles)
+
+    def schedule(self, at, kind, callback, *args):
+        """Schedule callback(*args) at virtual time `at`"""
+        event = [at, kind, self._seq, callback, args, True]
+        self._seq += 1
+        heapq.heappush(self.queue, event)
+        return event
+
+    def cancel(self, event):
+        # Lazy deletion: the entry stays queued but is skipped when popped
+        event[5] = False
+
+    def run(self, until=None, realtime=False, speed=1.0, max_events=None, before_event=None):
+        """Process events in timestamp order.
+
+        Runs as fast as possible by default; with `realtime` the loop sleeps so
+        that one virtual second takes 1/speed wall-clock seconds. `max_events`
+        stops after that many events, and `before_event(scheduler)` is called
+        with the next event still queued, so the state seen there is complete.
+        """
+        self.running = True
+        wall_start = time.time()
+        virtual_start = self.now
+        processed = 0
+
+        while self.running and self.queue:
+            at, kind, _, callback, args, active = self.queue[0]
+            if not active:
+                heapq.heappop(self.queue)
+                continue
+            if until is not None and at > until:
+                break
+            if max_events is not None and processed >= max_events:
+                self.running = False
+                return self.now
+            if before_event is not None:
+                before_event(self)
+                if not self.running:
+                    break  # The hook stopped the run before this event
+            heapq.heappop(self.queue)
+
+            if realtime:
+                delay = wall_start + (at - virtual_start) / speed - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                if not self.running:
+                    break
+
+            self.now = at
+            processed += 1
+            self.events_processed += 1
+            callback(*args)
+
+        if self.running and until is not None and self.now < until:
+            if realtime:
+                delay = wall_start + (until - virtual_start) / speed - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            self.now = until
+        self.running = False
+        return self.now
+
+    def stop(self):
+        self.running = False
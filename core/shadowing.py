@@ -0,0 +1,86 @@
+import math
+
+import numpy as np
+
+# Gudmundson decorrelation distance (m): shadowing correlation falls to 1/e over this distance
+DECORRELATION_DISTANCE = {
+    "urban": 50.0,
+    "suburban": 100.0,
+    "rural": 200.0,
+    "free_space": 200.0,
+    "indoor": 5.0,
+}
+MAX_GRID_CELLS = 4096  # Per side; coarser cells are used for very large areas
+
+
+class ShadowingMap:
+    """Spatially correlated log-normal shadowing over the simulation area.
+
+    A unit-variance Gaussian field with the Gudmundson autocorrelation
+    exp(-d / decorrelation_distance) is generated once by filtering white
+    noise in the frequency domain, stored as a grid and read back with
+    bilinear interpolation. A link's shadowing is std * (z_tx + z_rx) scaled
+    by 1 / sqrt(2 * (1 + rho(d))), where rho(d) is the field correlation over
+    the link length d, so every link has variance std^2 and the same value
+    for every packet between two fixed positions.
+    """
+
+    def __init__(self, area_size, std, decorrelation_distance=50.0, rng=None, resolution=None):
+        self.area_size = float(area_size)
+        self.std = std
+        self.decorrelation_distance = decorrelation_distance
+        rng = rng if rng is not None else np.random.default_rng()
+
+        # A few cells per decorrelation distance is enough for smooth interpolation
+        resolution = resolution or decorrelation_distance / 4
+        self.resolution = max(resolution, self.area_size / (MAX_GRID_CELLS - 1))
+        cells = int(math.ceil(self.area_size / self.resolution)) + 1
+
+        # Pad by a few decorrelation distances so the FFT's wrap-around does not
+        # correlate opposite edges of the area
+        pad = int(math.ceil(3 * decorrelation_distance / self.resolution))
+        size = cells + 2 * pad
+        noise = rng.standard_normal((size, size))
+
+        # Power spectrum of the 2D exponential autocorrelation
+        kx = np.fft.fftfreq(size, d=self.resolution)[:, None]
+        ky = np.fft.rfftfreq(size, d=self.resolution)[None, :]
+        spectrum = (1 + (2 * math.pi * decorrelation_distance) ** 2 * (kx ** 2 + ky ** 2)) ** -1.5
+        field = np.fft.irfft2(np.fft.rfft2(noise) * np.sqrt(spectrum), s=noise.shape)
+
+        field = field[pad:pad + cells, pad:pad + cells]
+        self.grid = (field - field.mean()) / field.std()
+
+    def value(self, x, y):
+        """Unit-variance field value at a point (bilinear interpolation)"""
+        last = self.grid.shape[0] - 1
+        gx = min(max(x / self.resolution, 0.0), last)
+        gy = min(max(y / self.resolution, 0.0), last)
+        i = min(int(gx), last - 1)
+        j = min(int(gy), last - 1)
+        fx = gx - i
+        fy = gy - j
+        grid = self.grid
+        return ((grid[i, j] * (1 - fx) + grid[i + 1, j] * fx) * (1 - fy) +
+                (grid[i, j + 1] * (1 - fx) + grid[i + 1, j + 1] * fx) * fy)
+
+    def values(self, points):
+        """Vectorized value() over an (n, 2) array of points"""
+        points = np.asarray(points, dtype=np.float64)
+        last = self.grid.shape[0] - 1
+        g = np.clip(points / self.resolution, 0.0, last)
+        ij = np.minimum(g.astype(np.int64), last - 1)
+        f = g - ij
+        i, j = ij[:, 0], ij[:, 1]
+        fx, fy = f[:, 0], f[:, 1]
+        grid = self.grid
+        return ((grid[i, j] * (1 - fx) + grid[i + 1, j] * fx) * (1 - fy) +
+                (grid[i, j + 1] * (1 - fx) + grid[i + 1, j + 1] * fx) * fy)
+
+    def link(self, tx_position, rx_position):
+        """Shadowing (dB) of the link between two positions"""
+        z = self.value(*tx_position) + self.value(*rx_position)
+        # The end points are correlated, so var(z) = 2 * (1 + rho(d)) rather than 2
+        distance = math.hypot(tx_position[0] - rx_position[0], tx_position[1] - rx_position[1])
+        rho = math.exp(-distance / self.decorrelation_distance)
+        return float(self.std * z / math.sqrt(2 * (1 + rho)))
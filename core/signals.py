@@ -0,0 +1,37 @@
+class Signal:
+    """Plain-Python stand-in for a Qt signal: a list of connected callbacks"""
+
+    def __init__(self):
+        self._slots = []
+
+    def connect(self, slot):
+        self._slots.append(slot)
+
+    def disconnect(self, slot=None):
+        if slot is None:
+            self._slots.clear()
+        elif slot in self._slots:
+            self._slots.remove(slot)
+
+    def emit(self, *args):
+        for slot in list(self._slots):
+            slot(*args)
+
+    def __bool__(self):
+        # True when anything is listening, so callers can skip building payloads
+        return bool(self._slots)
+
+
+class SimulationSignals:
+    """Callbacks published by the simulation core.
+
+    Slots run synchronously on the thread that runs the simulation; the GUI
+    wraps these in Qt signals (see gui/signals.py) to cross into the UI thread.
+    """
+
+    def __init__(self):
+        self.packet_sent = Signal()  # (src, dst, success)
+        self.update_metrics = Signal()  # (metrics dict)
+        self.log_message = Signal()  # (str)
+        self.simulation_finished = Signal()  # (metrics dict)
+        self.visualization_update = Signal()  # ()
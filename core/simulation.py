@@ -1,25 +1,41 @@
 import csv
 import os
-import random
 import time
 
-from PyQt5.QtCore import QObject, pyqtSignal
+import numpy as np
 
 from core.channel import LoRaChannel
+from core.checkpoint import CheckpointWriter, snapshot
+from core.destinations import DESTINATION_POLICIES, AliveIndex
+from core.energy_ledger import EnergyLedger
 from core.energy_model import EnergyModel
-from core.node import LoRaNode
+from core.histogram import PERCENTILES, PacketHistograms
+from core.link_cache import LinkBudgetCache
+from core.metrics import MetricsAggregator
+from core.mobility import move_nodes
+from core.node import RETAIN_COUNTERS, RETAIN_FULL, RETAIN_RING, LoRaNode
+from core.node_array import NodeArray
 from core.protocol import LoRaMPPProtocol
+from core.rng import RandomStreams
+from core.scheduler import EventScheduler
+from core.shadowing import DECORRELATION_DISTANCE, ShadowingMap
+from core.signals import SimulationSignals
+from core.spatial import SpatialGrid
+from core.trace import PacketTraceRecorder
 
-class SimulationSignals(QObject):
-    packet_sent = pyqtSignal(object, object, bool)
-    update_metrics = pyqtSignal(dict)
-    log_message = pyqtSignal(str)
-    simulation_finished = pyqtSignal(dict)
-    visualization_update = pyqtSignal()
 
-class LoRaMPPSimulation(QObject):
-    def __init__(self, num_nodes=5, area_size=100, environment="urban", logger=None, visualizer=None, adaptive=True):
-        super().__init__()
+# Log verbosity: run summaries only, or one line per packet as well
+LOG_SUMMARY = 1
+LOG_PACKETS = 2
+
+PAYLOAD_OVERHEAD = len("Msg from ")  # Fixed part of a generated payload (bytes)
+
+
+class LoRaMPPSimulation:
+    def __init__(self, num_nodes=5, area_size=100, environment="urban", logger=None, visualizer=None, adaptive=True,
+                 seed=None, trace_path=None, verbosity=LOG_PACKETS, retention=RETAIN_COUNTERS, ring_size=16,
+                 destination="uniform", gateways=1, metrics_window=60.0, streams=None, cache_links=False,
+                 link_tolerance=0.0, correlated_shadowing=False, decorrelation_distance=None):
         self.nodes = []
         self.area_size = area_size
         self.environment = environment
@@ -29,36 +45,56 @@ class LoRaMPPSimulation(QObject):
         self.running = False
         self.simulation_thread = None
         self.adaptive = adaptive
+        self.verbosity = verbosity
         self.signals = SimulationSignals()
-
-        # Statistics
-        self.total_packets_sent = 0
-        self.total_packets_received = 0
-        self.total_delay = 0.0
-        self.total_energy_used = 0.0
-        self.collisions = 0
+        self.scheduler = EventScheduler()
+        self.checkpoint_writer = CheckpointWriter()
+        self.checkpoint_path = None  # Where a timed run saves its state, if anywhere
+        self.event_hook = None  # Called with the scheduler before each event of a timed run
+        # Optional per-packet trace file (see core/trace.py)
+        self.trace = PacketTraceRecorder(trace_path) if trace_path else None
+
+        # Run timing; packet statistics live in self.metrics
         self.start_time = 0
         self.end_time = 0
-        self.adaptation_count = 0
+        self.duration = 0
+        self.packets_started = 0
+
+        # Independent random substreams; `self.seed` reproduces the run. A prepared
+        # RandomStreams (e.g. a recording one from core/replay.py) replaces `seed`
+        self.streams = streams if streams is not None else RandomStreams(seed)
+        self.seed = self.streams.seed
+        self.mobility_rng = self.streams.mobility
 
         # Initialize channel and energy model
-        self.channel = LoRaChannel(environment=environment)
+        self.channel = LoRaChannel(environment=environment, shadowing_rng=self.streams.shadowing,
+                                   fading_rng=self.streams.fading)
         self.energy_model = EnergyModel()
 
+        # Optional correlated shadowing field, built once from the shadowing stream
+        if correlated_shadowing:
+            if decorrelation_distance is None:
+                decorrelation_distance = DECORRELATION_DISTANCE.get(environment, DECORRELATION_DISTANCE["urban"])
+            self.channel.shadowing_map = ShadowingMap(area_size, self.channel.shadowing_std, decorrelation_distance,
+                                                      rng=self.streams.shadowing)
+
         # Adjust number of nodes for indoor environments
         if environment == "indoor" and num_nodes > 15:
             num_nodes = 15  # Limit nodes for indoor simulations
             if logger:
                 self.signals.log_message.emit(f"Reduced nodes to {num_nodes} for indoor environment")
 
-        # Create nodes
+        # With a trace file the full history lives on disk and nodes keep only recent packets
+        self.retention = retention
+        node_retention = RETAIN_RING if retention == RETAIN_FULL and self.trace is not None else retention
+
+        # Create nodes as views into one columnar store
+        self.node_array = NodeArray(num_nodes)
+        placement = self.streams.placement
         for i in range(num_nodes):
-            position = (
-                random.randint(0, area_size),
-                random.randint(0, area_size)
-            )
+            position = tuple(placement.integers(0, area_size, size=2, endpoint=True).tolist())
             # Adjust energy for indoor nodes
-            energy = random.uniform(80, 120)
+            energy = float(placement.uniform(80, 120))
             if environment == "indoor":
                 energy *= 1.5  # Indoor devices often have better power supply
 
@@ -66,12 +102,47 @@ class LoRaMPPSimulation(QObject):
                 node_id=f"Node{i + 1}",
                 position=position,
                 energy=energy,
-                environment=environment
+                environment=environment,
+                store=self.node_array,
+                index=i,
+                rng=self.mobility_rng,
+                retention=node_retention,
+                ring_size=ring_size
             )
             self.nodes.append(node)
 
+        # Shared spatial index for neighbour and range queries
+        self.comm_range = 30 if environment == "indoor" else 50
+        self.spatial_index = SpatialGrid(self.node_array.position, cell_size=self.comm_range)
+
+        # Running totals, updated incrementally by the node store and per packet
+        self.metrics = MetricsAggregator(self.node_array, window=metrics_window)
+        # Radio energy over virtual time: sleep between packets, TX/RX while on air
+        self.energy_ledger = EnergyLedger(self.node_array, voltage=self.energy_model.voltage)
+        # Tail latency and link quality distributions per SF
+        self.histograms = PacketHistograms()
+
+        # Live nodes and how senders pick their destination; `destination` is a policy
+        # name from DESTINATION_POLICIES or any object with choose(src, rng) -> row or None
+        self.alive_nodes = AliveIndex(self.node_array)
+        self.gateways = gateways
+        if isinstance(destination, str):
+            if destination not in DESTINATION_POLICIES:
+                raise ValueError(f"Unknown destination policy: {destination}")
+            destination = DESTINATION_POLICIES[destination](self)
+        self.destination_policy = destination
+
+        # Distance and mean path loss per node pair, invalidated when nodes move more than
+        # `link_tolerance` metres. Off by default: with per-tick mobility and no tolerance
+        # nearly every node moves every tick, so the cache costs more than it saves
+        self.link_cache = None
+        if cache_links:
+            self.link_cache = LinkBudgetCache(self.channel, self.node_array.position, tolerance=link_tolerance)
+
         # Initialize protocol
-        self.protocol = LoRaMPPProtocol(self.nodes, self.channel, self.energy_model, adaptive)
+        self.protocol = LoRaMPPProtocol(self.nodes, self.channel, self.energy_model, adaptive,
+                                        delivery_rng=self.streams.delivery, link_cache=self.link_cache,
+                                        ledger=self.energy_ledger)
 
     def run(self, num_messages=5):
         self.start_time = time.time()
@@ -80,10 +151,12 @@ class LoRaMPPSimulation(QObject):
         self.signals.log_message.emit(f"📡 Adaptive protocol: {'ENABLED' if self.adaptive else 'DISABLED'}")
 
         for _ in range(num_messages):
-            src = random.choice(self.nodes)
-            dst = random.choice([n for n in self.nodes if n.node_id != src.node_id])
-            self.send_packet(src, dst)
+            src = self.nodes[self.streams.traffic.integers(len(self.nodes))]
+            dst = self._choose_destination(src)
+            if dst is not None:  # Otherwise no live peer is left to send to
+                self.send_packet(src, dst)
 
+        self.energy_ledger.settle(self.scheduler.now)
         self.end_time = time.time()
         duration = self.end_time - self.start_time
         self.signals.log_message.emit(f"✅ Simulation completed in {duration:.2f} seconds.")
@@ -92,108 +165,241 @@ class LoRaMPPSimulation(QObject):
         for k, v in metrics.items():
             self.signals.log_message.emit(f"   {k}: {v}")
 
+        if self.trace is not None:
+            self.trace.flush()
         self.signals.simulation_finished.emit(metrics)
         return metrics
 
     def send_packet(self, src, dst):
-        payload = f"Msg{self.total_packets_sent + 1} from {src.node_id}"
-        success, delay = self.protocol.send_message(src.node_id, dst.node_id, payload)
-
-        self.total_packets_sent += 1
-        self.collisions = self.protocol.collisions
-        self.adaptation_count = sum(node.adaptation_counter for node in self.nodes)
-
-        if success:
-            self.total_packets_received += 1
-            self.total_delay += delay
-
-        # Log transmission details
-        distance = src.distance_to(dst)
-        msg = (f"[{'✔' if success else '✘'}] {src.node_id} → {dst.node_id} | "
-               f"Dist: {distance:.1f}m | SF: {src.spreading_factor} | BW: {src.bandwidth}kHz | "
-               f"Delay: {delay * 1000:.1f}ms | "
-               f"Energy: {src.energy:.1f}J | "
-               f"Motion: {'Yes' if src.motion_detected else 'No'}")
-
-        self.signals.log_message.emit(msg)
+        """Send one packet and resolve it at once, advancing the clock past it"""
+        transmission = self.protocol.begin_transmission(src.node_id, dst.node_id, self._make_payload(src),
+                                                        self.scheduler.now)
+        if transmission is None:
+            self._record_packet(src, dst, False, 0)
+            return
+        self.scheduler.now = transmission.end
+        self._finish_packet(transmission)
+
+    def start_packet(self, src, dst):
+        """Put a packet on the air at the current virtual time and schedule its end"""
+        transmission = self.protocol.begin_transmission(src.node_id, dst.node_id, self._make_payload(src),
+                                                        self.scheduler.now)
+        if transmission is None:
+            self._record_packet(src, dst, False, 0)
+            return
+        self.scheduler.schedule(transmission.end, EventScheduler.PACKET_END, self._finish_packet, transmission)
+
+    def _finish_packet(self, transmission):
+        success, delay = self.protocol.end_transmission(transmission)
+        self._record_packet(transmission.src, transmission.dst, success, delay, transmission)
+
+    def _make_payload(self, src):
+        """Payload length in bytes; same size as the text "Msg<n> from <node id>" without building it"""
+        self.packets_started += 1
+        return PAYLOAD_OVERHEAD + len(str(self.packets_started)) + len(src.node_id)
+
+    def _record_packet(self, src, dst, success, delay, transmission=None):
+        self.metrics.packet(self.scheduler.now, success, delay,
+                            transmission.payload_len if transmission is not None else 0,
+                            transmission is not None and transmission.collided)
+
+        if transmission is not None:
+            quality = transmission.signal_quality
+            self.histograms.record(self.environment, transmission.sf, transmission.airtime, quality['rssi'],
+                                   quality['snr'], delay if success else None)
+
+        if self.trace is not None:
+            self._trace_packet(src, dst, success, delay, transmission)
+
+        # Log transmission details (not even formatted below packet verbosity or when headless)
+        if self.verbosity >= LOG_PACKETS and self.signals.log_message:
+            if transmission is not None:
+                distance, sf, bw = transmission.distance, transmission.sf, transmission.bw
+            else:
+                distance, sf, bw = src.distance_to(dst), src.spreading_factor, src.bandwidth
+            msg = (f"[{'✔' if success else '✘'}] {src.node_id} → {dst.node_id} | "
+                   f"Dist: {distance:.1f}m | SF: {sf} | BW: {bw}kHz | "
+                   f"Delay: {delay * 1000:.1f}ms | "
+                   f"Energy: {src.energy:.1f}J | "
+                   f"Motion: {'Yes' if src.motion_detected else 'No'}")
+            self.signals.log_message.emit(msg)
         self.signals.packet_sent.emit(src, dst, success)
         self.signals.visualization_update.emit()
 
-    def run_with_mobility(self, duration=10, interval=1):
+    def _trace_packet(self, src, dst, success, delay, transmission):
+        nodes = self.node_array
+        i = src.index
+        if transmission is not None:
+            # Settings and start time of the packet itself; the node may have adapted since
+            quality = transmission.signal_quality
+            self.trace.record(i, dst.index, transmission.start, transmission.sf, transmission.bw, transmission.cr,
+                              transmission.tx_power, transmission.distance, quality['rssi'], quality['snr'], delay,
+                              success, nodes.energy[i])
+        else:
+            self.trace.record(i, dst.index, self.scheduler.now, nodes.sf[i], nodes.bw[i], nodes.cr[i],
+                              nodes.tx_power[i], src.distance_to(dst), float('nan'), float('nan'), delay, success,
+                              nodes.energy[i])
+
+    def __getstate__(self):
+        # Checkpoints hold the model state only; callbacks, GUI hooks and threads are not saved
+        state = self.__dict__.copy()
+        for name in ('signals', 'logger', 'visualizer', 'simulation_thread', 'checkpoint_writer', 'event_hook'):
+            state[name] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.signals = SimulationSignals()
+        self.checkpoint_writer = CheckpointWriter()
+
+    def run_with_mobility(self, duration=10, interval=1, realtime=False, speed=1.0, checkpoint_path=None,
+                          checkpoint_interval=None):
+        """Run a timed simulation on the virtual clock.
+
+        The event loop runs as fast as possible unless `realtime` is set, in
+        which case it is paced so one simulated second takes 1/speed seconds.
+        With `checkpoint_path`, the full state is saved there every
+        `checkpoint_interval` simulated seconds and once more when the run
+        ends (see core/checkpoint.py).
+        """
         self.running = True
         self.start_time = time.time()
-        self.total_packets_sent = 0
-        self.total_packets_received = 0
-        self.total_delay = 0.0
-        self.collisions = 0
-        self.adaptation_count = 0
+        self.metrics.reset_packets()
+        self.histograms = PacketHistograms()
+        self.duration = duration
+        self.checkpoint_path = checkpoint_path
 
         self.signals.log_message.emit(f"🔄 Starting timed simulation for {duration} seconds...")
         self.signals.log_message.emit(f"📡 Adaptive protocol: {'ENABLED' if self.adaptive else 'DISABLED'}")
 
-        while time.time() - self.start_time < duration and self.running:
-            # Update node positions
-            for node in self.nodes:
-                if node.energy > 0:  # Only move if node has energy
-                    node.move(self.area_size, self.environment)
-
-            self.signals.visualization_update.emit()
-
-            # Send packets from each node
-            for src in self.nodes:
-                if src.energy <= 0:  # Skip dead nodes
-                    continue
-
-                # Select a destination
-                dst = random.choice([n for n in self.nodes if n.node_id != src.node_id and n.energy > 0])
-                if dst:
-                    self.send_packet(src, dst)
-
-            # Sleep for the interval
-            time.sleep(interval)
-
+        self.scheduler = EventScheduler()
+        # The clock restarts at zero, so airtime left over from an earlier run must not overlap new packets
+        self.protocol.clear_air()
+        self.energy_ledger.rebase(self.scheduler.now)
+        self.scheduler.schedule(0.0, EventScheduler.NODE_MOVE, self._mobility_tick, interval)
+        if interval < duration:
+            self.scheduler.schedule(interval, EventScheduler.ENERGY_UPDATE, self._energy_tick, interval)
+        if checkpoint_path and checkpoint_interval and checkpoint_interval < duration:
+            self.scheduler.schedule(checkpoint_interval, EventScheduler.CHECKPOINT, self._checkpoint_tick,
+                                    checkpoint_path, checkpoint_interval)
+        self._run_events(realtime, speed)
+
+    def resume(self, realtime=False, speed=1.0):
+        """Continue a timed run restored with core.checkpoint.load_checkpoint()"""
+        self.running = True
+        self.start_time = time.time()
+        self.signals.log_message.emit(f"🔄 Resuming simulation at t={self.scheduler.now:.1f}s...")
+        self._run_events(realtime, speed)
+
+    def _run_events(self, realtime, speed):
+        self.scheduler.run(until=self.duration, realtime=realtime, speed=speed, before_event=self.event_hook)
+        if self.running:
+            # Let packets still on the air at the end of the run complete; nothing else
+            # may run past the end, or the clock would jump ahead and drain every battery
+            for event in self.scheduler.queue:
+                if event[1] != EventScheduler.PACKET_END:
+                    self.scheduler.cancel(event)
+            self.scheduler.run(before_event=self.event_hook)
+
+        self.energy_ledger.settle(self.scheduler.now)
         self.end_time = time.time()
-        sim_duration = self.end_time - self.start_time
-        self.signals.log_message.emit(f"🛑 Simulation ended after {sim_duration:.1f} seconds.")
+        wall_duration = self.end_time - self.start_time
+        self.signals.log_message.emit(
+            f"🛑 Simulation ended at t={self.scheduler.now:.1f}s (wall time {wall_duration:.1f} seconds).")
         metrics = self.get_metrics()
         for k, v in metrics.items():
             self.signals.log_message.emit(f"   {k}: {v}")
 
+        if self.trace is not None:
+            self.trace.flush()
+        if self.checkpoint_path:
+            # Saved even when the checkpoint interval is longer than the run
+            self.checkpoint_writer.submit(self.checkpoint_path, snapshot(self))
+        self.checkpoint_writer.wait()
+        if self.checkpoint_writer.error is not None:
+            self.signals.log_message.emit(f"⚠ Checkpoint could not be written: {self.checkpoint_writer.error}")
         self.signals.simulation_finished.emit(metrics)
 
+    def _checkpoint_tick(self, path, interval):
+        if self.scheduler.now + interval < self.duration:
+            self.scheduler.schedule(self.scheduler.now + interval, EventScheduler.CHECKPOINT, self._checkpoint_tick,
+                                    path, interval)
+        # Pickling is the only pause; compression and I/O happen on the writer thread
+        self.checkpoint_writer.submit(path, snapshot(self))
+
+    def _energy_tick(self, interval):
+        """Bring every battery up to date; runs just before the mobility tick at the same time"""
+        now = self.scheduler.now
+        self.energy_ledger.settle(now)
+        if now + interval < self.duration:
+            self.scheduler.schedule(now + interval, EventScheduler.ENERGY_UPDATE, self._energy_tick, interval)
+
+    def _mobility_tick(self, interval):
+        """Move every live node, then queue one packet per live sender"""
+        if not self.running:
+            return
+
+        now = self.scheduler.now
+        moved = move_nodes(self.node_array, self.area_size, self.environment, self.mobility_rng)
+        self.spatial_index.update(moved)
+        if self.link_cache is not None:
+            self.link_cache.invalidate(moved)
+
+        self.signals.visualization_update.emit()
+
+        # Each live node transmits once per interval at a random offset (unslotted ALOHA)
+        offsets = self.streams.traffic.uniform(0, interval, size=len(self.nodes))
+        senders = np.flatnonzero(self.node_array.alive)
+        for row, offset in zip(senders.tolist(), offsets[senders].tolist()):
+            self.scheduler.schedule(now + offset, EventScheduler.PACKET_START, self._send_from, self.nodes[row])
+
+        if now + interval < self.duration:
+            self.scheduler.schedule(now + interval, EventScheduler.NODE_MOVE, self._mobility_tick, interval)
+
+    def _send_from(self, src):
+        if src.energy <= 0 or self.scheduler.now >= self.duration:  # Node may have died earlier in this tick
+            return
+        if self.protocol.transmitting(src, self.scheduler.now):
+            return  # Its previous packet is still on the air, so this interval's one is skipped
+
+        dst = self._choose_destination(src)
+        if dst is not None:
+            self.start_packet(src, dst)
+
+    def _choose_destination(self, src):
+        row = self.destination_policy.choose(src, self.streams.traffic)
+        return None if row is None else self.nodes[row]
+
+    def close(self):
+        """Release the trace file, if any"""
+        if self.trace is not None:
+            self.trace.close()
+
     def stop(self):
         self.running = False
+        self.scheduler.stop()
         self.signals.log_message.emit("⏹ Simulation stopped manually.")
 
     def get_metrics(self):
-        pdr = (self.total_packets_received / self.total_packets_sent * 100) if self.total_packets_sent else 0
-        avg_delay = (self.total_delay / self.total_packets_received * 1000) if self.total_packets_received else 0
-
-        # FIX: Calculate actual energy used based on initial energy
-        total_energy = 0.0
-        for node in self.nodes:
-            energy_used = node.initial_energy - node.energy
-            if energy_used > 0:
-                total_energy += energy_used
-
-        # Calculate adaptive metrics
-        avg_sf = sum(node.spreading_factor for node in self.nodes) / len(self.nodes) if self.nodes else 0
-        avg_bw = sum(node.bandwidth for node in self.nodes) / len(self.nodes) if self.nodes else 0
-        indoor_detections = sum(1 for node in self.nodes if node.motion_detected)
+        # Packet counts and node totals come from the incremental aggregator, not a scan of the nodes
+        metrics = self.metrics
+        delays = self.histograms.combined('delay')
 
         return {
-            'Packets Sent': self.total_packets_sent,
-            'Packets Received': self.total_packets_received,
-            'PDR (%)': round(pdr, 2),
-            'Avg Delay (ms)': round(avg_delay, 1),
-            'Total Energy Used (J)': round(total_energy, 2),
-            'Collisions': self.collisions,
-            'Active Nodes': sum(1 for node in self.nodes if node.energy > 0),
+            'Packets Sent': metrics.sent,
+            'Packets Received': metrics.delivered,
+            'PDR (%)': round(metrics.pdr, 2),
+            'Avg Delay (ms)': round(metrics.delay.mean * 1000, 1),
+            **{f'Delay p{p} (ms)': round(delays.percentile(p) * 1000, 1) for p in PERCENTILES},
+            'Max Delay (ms)': round(delays.max * 1000, 1) if delays.count else 0,
+            'Total Energy Used (J)': round(metrics.energy_used, 2),
+            'Collisions': metrics.collisions,
+            'Active Nodes': metrics.alive,
             'Total Nodes': len(self.nodes),  # Added for metrics panel
-            'Avg SF': round(avg_sf, 2),
-            'Avg BW (kHz)': round(avg_bw, 2),
-            'Indoor Detections': indoor_detections,
-            'Parameter Adaptations': self.adaptation_count
+            'Avg SF': round(metrics.avg_sf, 2),
+            'Avg BW (kHz)': round(metrics.avg_bw, 2),
+            'Indoor Detections': metrics.indoor_detections,
+            'Parameter Adaptations': metrics.adaptations
         }
 
     def export_results_to_csv(self, filename="simulation_results.csv"):
@@ -0,0 +1,128 @@
+import math
+import threading
+
+import numpy as np
+
+
+class SpatialGrid:
+    """Uniform grid index over node positions for range and pair queries.
+
+    `positions` is the live (n, 2) position array of a NodeArray; call
+    update() with the rows that moved to keep the buckets in sync. Queries
+    only look at the cells that can hold points within the radius, so they
+    cost roughly O(n + k) instead of the O(n^2) all-pairs scan.
+    """
+
+    def __init__(self, positions, cell_size):
+        self.positions = positions
+        self.cell_size = float(cell_size)
+        self.cells = {}  # (cx, cy) -> set of rows
+        self.node_cells = np.zeros((len(positions), 2), dtype=np.int64)
+        self._lock = threading.Lock()  # Queried from the GUI thread while the simulation moves nodes
+        self.rebuild()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _cell_of(self, points):
+        return np.floor(np.asarray(points, dtype=np.float64) / self.cell_size).astype(np.int64)
+
+    def rebuild(self):
+        with self._lock:
+            self.node_cells = self._cell_of(self.positions)
+            self.cells = {}
+            for row, cell in enumerate(map(tuple, self.node_cells.tolist())):
+                self.cells.setdefault(cell, set()).add(row)
+
+    def update(self, indices=None):
+        """Re-bucket the given rows (all rows by default) after they moved"""
+        with self._lock:
+            if indices is None:
+                indices = np.arange(len(self.positions))
+            indices = np.asarray(indices, dtype=np.int64)
+            new_cells = self._cell_of(self.positions[indices])
+            changed = np.any(new_cells != self.node_cells[indices], axis=1)
+            rows = indices[changed]
+            if not len(rows):
+                return 0
+
+            old_cells = self.node_cells[rows]
+            for row, old, new in zip(rows.tolist(), map(tuple, old_cells.tolist()),
+                                     map(tuple, new_cells[changed].tolist())):
+                bucket = self.cells[old]
+                bucket.discard(row)
+                if not bucket:
+                    del self.cells[old]
+                self.cells.setdefault(new, set()).add(row)
+            self.node_cells[rows] = new_cells[changed]
+            return len(rows)
+
+    def query_point(self, point, radius):
+        """Rows of all nodes within `radius` of `point`"""
+        x, y = point
+        reach = math.ceil(radius / self.cell_size)
+        cx, cy = int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+        with self._lock:
+            candidates = []
+            for i in range(cx - reach, cx + reach + 1):
+                for j in range(cy - reach, cy + reach + 1):
+                    bucket = self.cells.get((i, j))
+                    if bucket:
+                        candidates.extend(bucket)
+        if not candidates:
+            return np.empty(0, dtype=np.int64)
+
+        candidates = np.array(candidates, dtype=np.int64)
+        offsets = self.positions[candidates] - np.array([x, y], dtype=np.float64)
+        within = offsets[:, 0] ** 2 + offsets[:, 1] ** 2 <= radius * radius
+        return candidates[within]
+
+    def neighbors(self, index, radius):
+        """Rows of all nodes within `radius` of node `index`, excluding itself"""
+        rows = self.query_point(self.positions[index], radius)
+        return rows[rows != index]
+
+    def query_pairs(self, radius):
+        """All pairs (i, j) with i < j and distance <= radius, as a (k, 2) array"""
+        reach = math.ceil(radius / self.cell_size)
+        # Half of the neighbourhood so each pair of cells is visited once
+        forward = [(di, dj) for di in range(0, reach + 1) for dj in range(-reach, reach + 1)
+                   if di > 0 or dj > 0]
+
+        with self._lock:
+            buckets = {cell: np.fromiter(rows, dtype=np.int64, count=len(rows))
+                       for cell, rows in self.cells.items()}
+
+        pairs = []
+        r2 = radius * radius
+        for (ci, cj), rows in buckets.items():
+            points = self.positions[rows].astype(np.float64)
+
+            # Pairs inside the cell
+            if len(rows) > 1:
+                a, b = np.triu_indices(len(rows), k=1)
+                d = points[a] - points[b]
+                keep = d[:, 0] ** 2 + d[:, 1] ** 2 <= r2
+                pairs.append(np.column_stack((rows[a[keep]], rows[b[keep]])))
+
+            # Pairs with neighbouring cells
+            for di, dj in forward:
+                other = buckets.get((ci + di, cj + dj))
+                if other is None:
+                    continue
+                other_points = self.positions[other].astype(np.float64)
+                d = points[:, None, :] - other_points[None, :, :]
+                a, b = np.nonzero(d[..., 0] ** 2 + d[..., 1] ** 2 <= r2)
+                pairs.append(np.column_stack((rows[a], other[b])))
+
+        if not pairs:
+            return np.empty((0, 2), dtype=np.int64)
+        pairs = np.concatenate(pairs)
+        return np.sort(pairs, axis=1)
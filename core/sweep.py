@@ -0,0 +1,70 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from core.simulation import LoRaMPPSimulation
+
+
+def expand_grid(grid):
+    """Expand {constructor_arg: [values]} into one kwargs dict per grid point"""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def run_point(params, seed, run_args):
+    """Run one replication of one grid point; executed in a worker process.
+
+    Returns the metrics and the run's packet histograms.
+    """
+    simulation = LoRaMPPSimulation(seed=seed, **params)
+
+    if run_args.get('num_messages'):
+        metrics = simulation.run(num_messages=run_args['num_messages'])
+    else:
+        simulation.run_with_mobility(duration=run_args.get('duration', 10), interval=run_args.get('interval', 1))
+        metrics = simulation.get_metrics()
+    return metrics, simulation.histograms
+
+
+def run_sweep(grid, replications=1, run_args=None, workers=None, seed=0, progress=None, histograms=None):
+    """Run every point of a parameter grid `replications` times over a process pool.
+
+    `grid` maps LoRaMPPSimulation constructor arguments to lists of values and
+    `run_args` holds either duration/interval for a timed run or num_messages.
+    Each run gets its own seed derived from `seed`, so the sweep is
+    reproducible. `progress(done, total)` is called as runs complete. If a
+    PacketHistograms is passed as `histograms`, every run's histograms are
+    merged into it.
+    Returns one row per run: the grid point, replication, seed and metrics.
+    """
+    run_args = run_args or {}
+    points = expand_grid(grid)
+    jobs = [(params, replication) for params in points for replication in range(replications)]
+    seeds = np.random.SeedSequence(seed).generate_state(len(jobs), dtype=np.uint64).tolist()
+    rows = [None] * len(jobs)
+
+    def record(job_index, result):
+        metrics, run_histograms = result
+        if histograms is not None:
+            histograms.merge(run_histograms)
+        params, replication = jobs[job_index]
+        rows[job_index] = dict(params, **{'Replication': replication + 1, 'Seed': seeds[job_index]}, **metrics)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for job_index, (params, _) in enumerate(jobs):
+            record(job_index, run_point(params, seeds[job_index], run_args))
+            if progress:
+                progress(job_index + 1, len(jobs))
+        return rows
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_point, params, seeds[job_index], run_args): job_index
+                   for job_index, (params, _) in enumerate(jobs)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            record(futures[future], future.result())
+            if progress:
+                progress(done, len(jobs))
+    return rows
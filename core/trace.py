@@ -0,0 +1,101 @@
+import os
+import struct
+from array import array
+
+import numpy as np
+
+# One fixed-size binary record per packet; the file is a short header followed
+# by a packed array of these records, so it can be memory-mapped directly
+TRACE_DTYPE = np.dtype([
+    ('src', np.int32),  # node index
+    ('dst', np.int32),
+    ('timestamp', np.float64),  # virtual time the packet went on air (s)
+    ('sf', np.uint8),
+    ('bw', np.uint16),  # kHz
+    ('cr', np.uint8),
+    ('tx_power', np.int8),  # dBm
+    ('distance', np.float32),  # m
+    ('rssi', np.float32),  # dBm
+    ('snr', np.float32),  # dB
+    ('delay', np.float32),  # s
+    ('success', np.bool_),
+    ('energy', np.float32),  # source energy left (J)
+])
+
+MAGIC = b'LRTRACE1'
+HEADER = struct.Struct('<8sII')  # magic, record size, reserved
+
+# array.array typecode for each field's column buffer
+_TYPECODES = {'int32': 'i', 'float64': 'd', 'uint8': 'B', 'uint16': 'H', 'int8': 'b', 'float32': 'f', 'bool': 'B'}
+
+
+class PacketTraceRecorder:
+    """Streams per-packet records to a compact binary file.
+
+    Fields are appended to typed column buffers and written out in chunks of
+    `chunk_size` records, so memory stays bounded however long the run is.
+    """
+
+    def __init__(self, path, chunk_size=65536):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.columns = [(name, array(_TYPECODES[TRACE_DTYPE[name].name])) for name in TRACE_DTYPE.names]
+        self.records_written = 0
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, TRACE_DTYPE.itemsize, 0))
+
+    def __getstate__(self):
+        # Checkpoints keep the path and record count; the file is reopened on restore
+        self.flush()
+        state = self.__dict__.copy()
+        state['file'] = self.file is not None  # Whether to reopen it
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if not self.file:
+            self.file = None
+            return
+        # Drop records written after the checkpoint was taken and append from there
+        self.file = open(self.path, 'r+b')
+        self.file.truncate(HEADER.size + self.records_written * TRACE_DTYPE.itemsize)
+        self.file.seek(0, os.SEEK_END)
+
+    def record(self, src, dst, timestamp, sf, bw, cr, tx_power, distance, rssi, snr, delay, success, energy):
+        values = (src, dst, timestamp, sf, bw, cr, tx_power, distance, rssi, snr, delay, success, energy)
+        for (_, column), value in zip(self.columns, values):
+            column.append(value)
+        if len(self.columns[0][1]) >= self.chunk_size:
+            self.flush()
+
+    def __len__(self):
+        return self.records_written + len(self.columns[0][1])
+
+    def flush(self):
+        pending = len(self.columns[0][1])
+        if not pending or self.file is None:
+            return
+        chunk = np.empty(pending, dtype=TRACE_DTYPE)
+        for name, column in self.columns:
+            chunk[name] = np.frombuffer(column, dtype=TRACE_DTYPE[name] if name != 'success' else np.uint8)
+            del column[:]
+        self.file.write(chunk.tobytes())
+        self.file.flush()
+        self.records_written += pending
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+
+def load_trace(path):
+    """Memory-map a packet trace as a read-only structured array (zero copy)"""
+    with open(path, 'rb') as file:
+        magic, record_size, _ = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC or record_size != TRACE_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a packet trace of this format")
+    if os.path.getsize(path) == HEADER.size:
+        return np.empty(0, dtype=TRACE_DTYPE)
+    return np.memmap(path, dtype=TRACE_DTYPE, mode='r', offset=HEADER.size)
@@ -1,14 +1,37 @@
-import math
 import time
+from collections import deque
 
+import numpy as np
 from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QSizePolicy
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba
 from matplotlib.figure import Figure
 
+from core.spatial import SpatialGrid
+
+ENERGY_COLORS = np.array([to_rgba('red'), to_rgba('orange'), to_rgba('green')])
+FRAME_INTERVAL = 33  # ms, ~30 fps
+LABEL_LIMIT = 100  # Node labels are hidden above this many nodes
+PACKET_LIFETIME = 0.8  # s a packet line takes to fade out
+MAX_PACKET_SEGMENTS = 500  # Newest packet lines kept on screen
+PACKET_SUCCESS_COLOR = np.array(to_rgba('#4CAF50'))
+PACKET_FAILURE_COLOR = np.array(to_rgba('#F44336'))
+
 
 class AnimationPanel(FigureCanvas):
-    def __init__(self, nodes, area_size=100, environment="urban"):
+    """Network view that keeps its artists alive and blits them each frame.
+
+    Static content (axes, grid, walls, and the topology edges, which only change
+    when nodes move) is rendered and cached as a background; nodes, labels and
+    packets are animated artists whose
+    data is updated in place and redrawn on a ~30 fps timer when anything changed.
+    Packets arriving between frames are drawn together as one fading collection,
+    so redraws are bounded by the frame rate rather than the packet rate.
+    """
+
+    def __init__(self, nodes, area_size=100, environment="urban", spatial_index=None):
         # Create larger figure for better visualization
         self.figure = Figure(figsize=(10, 8), dpi=100)
         super().__init__(self.figure)
@@ -16,12 +39,25 @@ class AnimationPanel(FigureCanvas):
         self.nodes = nodes
         self.area_size = area_size
         self.environment = environment
-        self.packet_lines = []
-        self.connection_lines = []  # Store network topology lines
-        self.motion_markers = []  # Store motion detection markers
-        self.last_update = time.time()
+        self.spatial_index = spatial_index  # Shared with the simulation when available
+        self.comm_range = 30 if environment.lower() == "indoor" else 50
+        # Packet overlay: events queued between frames, then drawn as one collection
+        self.pending_packets = deque()
+        self.packet_segments = np.empty((0, 2, 2))
+        self.packet_success = np.empty(0, dtype=bool)
+        self.packet_births = np.empty(0)
+        self.background = None
+        self.dirty = True  # Artists changed since the last blit
+        self.stale = False  # Node data changed since the last refresh
         self.setup_plot()
 
+        # Re-capture the background whenever the canvas is fully redrawn (resize, axis changes)
+        self.mpl_connect('draw_event', self.on_draw)
+
+        self.frame_timer = QTimer(self)
+        self.frame_timer.timeout.connect(self.render_frame)
+        self.frame_timer.start(FRAME_INTERVAL)
+
         # Set size policy to expand
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.setStyleSheet("background-color: white; border: 1px solid #cccccc; border-radius: 4px;")
@@ -47,155 +83,144 @@ class AnimationPanel(FigureCanvas):
         else:
             self.ax.grid(True, linestyle='--', alpha=0.7)
 
+        # Persistent artists; only their data changes from frame to frame
+        empty = np.empty((0, 2))
+        # Topology only changes when nodes move, so it is part of the cached background
+        self.topology = LineCollection([], colors='#1f77b4', alpha=0.3, linewidths=1.0, zorder=1)
+        self.topology_xy = None
+        self.ax.add_collection(self.topology)
+        self.packet_overlay = LineCollection([], linewidths=2.0, zorder=3, animated=True)
+        self.ax.add_collection(self.packet_overlay)
+        self.motion_scatter = self.ax.scatter(empty[:, 0], empty[:, 1], s=100, c='blue', alpha=0.5, zorder=4,
+                                              animated=True)
+        self.scatter = self.ax.scatter(empty[:, 0], empty[:, 1], s=[], alpha=0.8, edgecolors='black', zorder=5,
+                                       animated=True)
+
+        show_labels = len(self.nodes) <= LABEL_LIMIT
+        self.node_texts = []
+        self.energy_texts = []
+        if show_labels:
+            for node in self.nodes:
+                self.node_texts.append(self.ax.text(0, 0, f"{node.node_id}", fontsize=9, zorder=6, animated=True))
+                self.energy_texts.append(self.ax.text(0, 0, "", fontsize=8, color='gray', zorder=6, animated=True))
+
         # Draw nodes
         self.draw_nodes()
 
         # Draw network connections
         self.draw_network_topology()
 
+    def _node_state(self):
+        """Positions, energy, SF and motion flags of all nodes as arrays"""
+        store = self.nodes[0].store if self.nodes else None
+        if store is not None and len(store) == len(self.nodes):
+            return (store.position.astype(np.float64), store.energy.copy(), store.sf.copy(),
+                    store.motion_detected.copy())
+        return (np.array([node.position for node in self.nodes], dtype=np.float64).reshape(-1, 2),
+                np.array([node.energy for node in self.nodes]),
+                np.array([node.spreading_factor for node in self.nodes]),
+                np.array([node.motion_detected for node in self.nodes], dtype=bool))
+
     def draw_nodes(self):
-        """Draw all nodes with their current positions and status"""
-        # Clear previous elements
-        if hasattr(self, 'scatter'):
-            try:
-                self.scatter.remove()
-            except:
-                pass
-
-        # Clear previous motion markers
-        for marker in self.motion_markers:
-            try:
-                marker.remove()
-            except:
-                pass
-        self.motion_markers = []
-
-        # Clear previous text annotations
-        if hasattr(self, 'node_texts'):
-            for text in self.node_texts:
-                try:
-                    text.remove()
-                except:
-                    pass
-            self.node_texts = []
-
-        if hasattr(self, 'energy_texts'):
-            for text in self.energy_texts:
-                try:
-                    text.remove()
-                except:
-                    pass
-            self.energy_texts = []
-
-        # Get current positions
-        self.x = [node.position[0] for node in self.nodes]
-        self.y = [node.position[1] for node in self.nodes]
-        self.colors = [node.get_energy_color() for node in self.nodes]
-        self.sizes = [40 + node.spreading_factor * 5 for node in self.nodes]  # Larger sizes
-
-        # Create new scatter plot
-        self.scatter = self.ax.scatter(self.x, self.y, c=self.colors, s=self.sizes, alpha=0.8, edgecolors='black',
-                                       zorder=5)
-
-        # Create text annotations
-        self.node_texts = []
-        self.energy_texts = []
+        """Update node artists with the current positions and status"""
+        xy, energy, sf, motion = self._node_state()
+        self.xy = xy
+        self.x = xy[:, 0]
+        self.y = xy[:, 1]
 
-        for i, node in enumerate(self.nodes):
-            # Node ID and parameters
-            node_text = self.ax.text(
-                self.x[i] + 1.5, self.y[i] + 1.5,  # Slightly larger offset
-                f"{node.node_id}",
-                fontsize=9,
-                zorder=6
-            )
-            self.node_texts.append(node_text)
-
-            # Energy text - always show energy
-            energy_text = self.ax.text(
-                self.x[i] - 5, self.y[i] - 5,
-                f"E:{node.energy:.1f}J\nSF:{node.spreading_factor}",
-                fontsize=8,
-                color='gray',
-                zorder=6
-            )
-            self.energy_texts.append(energy_text)
-
-            # Add motion detection marker
-            if node.motion_detected:
-                marker = self.ax.plot(
-                    node.position[0], node.position[1],
-                    'bo', markersize=10, alpha=0.5, zorder=4
-                )[0]
-                self.motion_markers.append(marker)
+        # Same thresholds as LoRaNode.get_energy_color
+        color_index = np.where(energy > 50, 2, np.where(energy > 20, 1, 0))
+        self.scatter.set_offsets(xy)
+        self.scatter.set_facecolors(ENERGY_COLORS[color_index])
+        self.scatter.set_sizes(40 + sf * 5)  # Larger sizes
 
-    def update_visualization(self):
-        """Update all visualization elements"""
-        current_time = time.time()
-        if current_time - self.last_update < 0.2:  # Limit updates to 5fps
-            return
+        # Motion detection markers
+        self.motion_scatter.set_offsets(xy[motion])
 
-        self.last_update = current_time
-        self.draw_nodes()
-        self.draw_network_topology()
-        self.draw()
+        # Node ID and energy annotations
+        for i, (node_text, energy_text) in enumerate(zip(self.node_texts, self.energy_texts)):
+            node_text.set_position((self.x[i] + 1.5, self.y[i] + 1.5))
+            energy_text.set_position((self.x[i] - 5, self.y[i] - 5))
+            energy_text.set_text(f"E:{energy[i]:.1f}J\nSF:{sf[i]}")
+
+        self.dirty = True
 
     def draw_network_topology(self):
-        """Draw lines between connected nodes"""
-        # Clear existing connection lines
-        for line in self.connection_lines:
-            try:
-                line.remove()
-            except:
-                pass
-        self.connection_lines = []
-
-        # Draw connections between all nodes within communication range
-        comm_range = 30 if self.environment.lower() == "indoor" else 50
-        for i, src in enumerate(self.nodes):
-            for j, dst in enumerate(self.nodes):
-                if i >= j:
-                    continue  # Avoid duplicate connections
-
-                distance = math.sqrt((self.x[i] - self.x[j]) ** 2 + (self.y[i] - self.y[j]) ** 2)
-                if distance <= comm_range:
-                    line = self.ax.plot(
-                        [self.x[i], self.x[j]],
-                        [self.y[i], self.y[j]],
-                        color='#1f77b4', alpha=0.3, linewidth=1.0, zorder=1
-                    )[0]
-                    self.connection_lines.append(line)
+        """Update the line collection joining nodes within communication range"""
+        if self.topology_xy is not None and np.array_equal(self.topology_xy, self.xy):
+            return  # Nobody moved
+        self.topology_xy = self.xy
+        index = self.spatial_index
+        if index is None:
+            index = SpatialGrid(self.xy, cell_size=self.comm_range)
+        pairs = index.query_pairs(self.comm_range)
+        self.topology.set_segments(self.xy[pairs])
+        self.background = None  # Re-render the background on the next frame
+
+    def update_visualization(self):
+        """Mark node data as changed; it is refreshed and drawn on the next frame"""
+        self.stale = True
+
+    def animated_artists(self):
+        return [self.motion_scatter, self.packet_overlay, self.scatter,
+                *self.node_texts, *self.energy_texts]
+
+    def on_draw(self, event):
+        # A full draw skips animated artists: cache what it produced, then draw them on top
+        self.background = self.copy_from_bbox(self.ax.bbox)
+        self.draw_animated()
+
+    def draw_animated(self):
+        for artist in self.animated_artists():
+            self.ax.draw_artist(artist)
+        self.dirty = False
+
+    def render_frame(self):
+        """Timer callback: restore the cached background and redraw the animated artists"""
+        if self.stale:
+            # Any number of updates between frames collapse into one refresh
+            self.stale = False
+            self.draw_nodes()
+            self.draw_network_topology()
+        self.update_packet_overlay(time.monotonic())
+        if self.background is None:
+            self.draw()
+            return
+        if not self.dirty:
+            return
+        self.restore_region(self.background)
+        self.draw_animated()
+        self.blit(self.ax.bbox)
 
     def animate_packet(self, src_node, dst_node, success):
-        """Animate a packet transmission between nodes"""
-        # Remove old packet lines
-        for line in self.packet_lines:
-            try:
-                line.remove()
-            except:
-                pass
-        self.packet_lines.clear()
-
-        line_color = '#4CAF50' if success else '#F44336'
-        line_style = '-' if success else '--'
-
-        line, = self.ax.plot(
-            [src_node.position[0], dst_node.position[0]],
-            [src_node.position[1], dst_node.position[1]],
-            color=line_color, linewidth=2.0, linestyle=line_style, alpha=0.9, zorder=3
-        )
-        self.packet_lines.append(line)
-        self.draw()
-
-        # Schedule removal after delay
-        QTimer.singleShot(800, lambda: self.remove_packet_line(line))
-
-    def remove_packet_line(self, line):
-        """Remove a packet transmission line"""
-        if line in self.packet_lines:
-            try:
-                line.remove()
-                self.packet_lines.remove(line)
-                self.draw()
-            except:
-                pass
\ No newline at end of file
+        """Queue a packet transmission for the overlay; safe to call from any thread"""
+        self.pending_packets.append((src_node.position, dst_node.position, success))
+
+    def update_packet_overlay(self, now):
+        """Fold queued packets into the overlay and fade out old segments"""
+        if self.pending_packets:
+            count = len(self.pending_packets)
+            arrived = [self.pending_packets.popleft() for _ in range(count)]
+            segments = np.array([(src, dst) for src, dst, _ in arrived], dtype=np.float64)
+            success = np.array([ok for _, _, ok in arrived], dtype=bool)
+            self.packet_segments = np.concatenate((self.packet_segments, segments))[-MAX_PACKET_SEGMENTS:]
+            self.packet_success = np.concatenate((self.packet_success, success))[-MAX_PACKET_SEGMENTS:]
+            self.packet_births = np.concatenate((self.packet_births, np.full(count, now)))[-MAX_PACKET_SEGMENTS:]
+        elif not len(self.packet_births):
+            return
+
+        # Expire segments older than the fade-out time
+        age = now - self.packet_births
+        keep = age < PACKET_LIFETIME
+        if not keep.all():
+            self.packet_segments = self.packet_segments[keep]
+            self.packet_success = self.packet_success[keep]
+            self.packet_births = self.packet_births[keep]
+            age = age[keep]
+
+        colors = np.where(self.packet_success[:, None], PACKET_SUCCESS_COLOR, PACKET_FAILURE_COLOR)
+        colors[:, 3] = 0.9 * (1 - age / PACKET_LIFETIME)
+        self.packet_overlay.set_segments(self.packet_segments)
+        self.packet_overlay.set_color(colors)
+        self.packet_overlay.set_linestyle(['-' if ok else '--' for ok in self.packet_success])
+        self.dirty = True
@@ -1,12 +1,25 @@
-from PyQt5.QtWidgets import QTextEdit
+import threading
+from collections import deque
 
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QPlainTextEdit
 
-class Logger(QTextEdit):
-    def __init__(self):
+
+class Logger(QPlainTextEdit):
+    """Log view fed through a bounded ring buffer.
+
+    log() may be called from any thread; messages are collected and written
+    to the widget in one bulk insert per timer tick. When messages arrive
+    faster than they can be shown the oldest are dropped and the number of
+    dropped lines is reported instead.
+    """
+
+    def __init__(self, max_lines=5000, buffer_size=2000, flush_interval=100, lines_per_flush=500):
         super().__init__()
         self.setReadOnly(True)
+        self.setMaximumBlockCount(max_lines)  # Oldest lines are discarded by the widget
         self.setStyleSheet("""
-                    QTextEdit {
+                    QPlainTextEdit {
                         background-color: #f9f9f9;
                         color: #333333;
                         font-family: Consolas, monospace;
@@ -16,6 +29,31 @@ class Logger(QTextEdit):
                     }
                 """)
 
+        self.buffer = deque(maxlen=buffer_size)
+        self.lines_per_flush = lines_per_flush
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.timeout.connect(self.flush)
+        self.flush_timer.start(flush_interval)
+
     def log(self, message):
-        self.append(message)
-        self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
\ No newline at end of file
+        with self._lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(message)
+
+    def flush(self):
+        with self._lock:
+            count = min(len(self.buffer), self.lines_per_flush)
+            lines = [self.buffer.popleft() for _ in range(count)]
+            dropped, self.dropped = self.dropped, 0
+
+        if dropped:
+            lines.insert(0, f"… {dropped} messages dropped (log rate too high)")
+        if not lines:
+            return
+
+        self.appendPlainText("\n".join(lines))
+        self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
@@ -1,12 +1,16 @@
+import os
 import threading
+import time
 
 from PyQt5.QtCore import QTimer, Qt
 from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QTabWidget, QGroupBox, QGridLayout, QLabel, QSpinBox, \
     QComboBox, QCheckBox, QPushButton, QFileDialog, QMessageBox, QHBoxLayout, QSlider, QSplitter
 
-from core.simulation import LoRaMPPSimulation
+from core.replay import Recorder
+from core.simulation import LOG_PACKETS, LOG_SUMMARY, LoRaMPPSimulation
 from gui.animation_panel import AnimationPanel
 from gui.logger import Logger
+from gui.signals import QtSimulationSignals
 from utils.metrics import MetricsPanel
 
 
@@ -68,6 +72,9 @@ class MainWindow(QMainWindow):
 
         # Internal variables
         self.simulation = None
+        self.runner = None  # The simulation, or the Recorder driving it
+        self.recorder = None
+        self.signals = None
         self.visualizer = None
         self.area_size = 100
         self.simulation_thread = None
@@ -123,11 +130,22 @@ class MainWindow(QMainWindow):
         self.sensitivity_slider.setValue(5)
         control_layout.addWidget(self.sensitivity_slider, 2, 3)
 
+        # Log detail
+        control_layout.addWidget(QLabel("Log Detail:"), 3, 0)
+        self.log_level_combo = QComboBox()
+        self.log_level_combo.addItem("Per Packet", LOG_PACKETS)
+        self.log_level_combo.addItem("Summary Only", LOG_SUMMARY)
+        control_layout.addWidget(self.log_level_combo, 3, 1)
+
+        # Record random draws and events so odd runs can be replayed (python -m core.cli replay)
+        self.record_check = QCheckBox("Record Run for Replay")
+        control_layout.addWidget(self.record_check, 3, 2, 1, 2)
+
         # Button container
         button_container = QWidget()
         button_layout = QHBoxLayout()
         button_container.setLayout(button_layout)
-        control_layout.addWidget(button_container, 3, 0, 1, 4)
+        control_layout.addWidget(button_container, 4, 0, 1, 4)
 
         # Run button
         self.run_button = QPushButton("Run Simulation")
@@ -238,25 +256,24 @@ class MainWindow(QMainWindow):
         adaptive = self.adaptive_check.isChecked()
 
         # Initialize simulation
-        self.simulation = LoRaMPPSimulation(
-            num_nodes=num_nodes,
-            area_size=self.area_size,
-            environment=environment.lower(),
-            adaptive=adaptive
-        )
+        self.create_simulation(num_nodes, environment, adaptive)
 
-        # Connect simulation signals
+        # Connect simulation signals through the Qt adapter
+        self.signals = QtSimulationSignals(self.simulation.signals)
+        # The logger buffers messages itself, so it is fed directly from the worker thread
         self.simulation.signals.log_message.connect(self.logger.log)
+        # Packets are queued by the visualizer and drawn on its frame timer
         self.simulation.signals.packet_sent.connect(self.handle_packet_animation)
-        self.simulation.signals.visualization_update.connect(self.update_visualization)
-        self.simulation.signals.simulation_finished.connect(self.handle_simulation_finished)
+        self.signals.visualization_update.connect(self.update_visualization)
+        self.signals.simulation_finished.connect(self.handle_simulation_finished)
 
         # Create visualizer
         self.clear_visualization_tab()
         self.visualizer = AnimationPanel(
             self.simulation.nodes,
             self.area_size,
-            environment=environment
+            environment=environment,
+            spatial_index=self.simulation.spatial_index
         )
 
         # Add to visualization tab with expanding layout
@@ -277,9 +294,33 @@ class MainWindow(QMainWindow):
         self.stop_button.setEnabled(True)
 
         # Run in a separate thread to keep UI responsive
-        self.simulation_thread = threading.Thread(target=self.simulation.run)
+        self.simulation_thread = threading.Thread(target=self.runner.run)
         self.simulation_thread.start()
 
+    def create_simulation(self, num_nodes, environment, adaptive):
+        """Create the simulation, wrapped in a Recorder when recording is enabled"""
+        simulation_args = dict(
+            num_nodes=num_nodes,
+            area_size=self.area_size,
+            environment=environment.lower(),
+            adaptive=adaptive,
+            verbosity=self.log_level_combo.currentData()
+        )
+        if self.record_check.isChecked():
+            self.recorder = Recorder(**simulation_args)
+            self.simulation = self.recorder.simulation
+            self.runner = self.recorder
+        else:
+            self.recorder = None
+            self.simulation = self.runner = LoRaMPPSimulation(**simulation_args)
+
+    def save_recording(self):
+        os.makedirs("exports", exist_ok=True)
+        path = os.path.join("exports", f"recording_{time.strftime('%Y%m%d_%H%M%S')}.lrrec")
+        self.recorder.recording.save(path)
+        self.logger.log(f"🎞 Run recorded to {path} (replay with: python -m core.cli replay {path})")
+        self.recorder = None
+
     def handle_packet_animation(self, src, dst, success):
         if self.visualizer:
             self.visualizer.animate_packet(src, dst, success)
@@ -295,6 +336,9 @@ class MainWindow(QMainWindow):
         self.timed_button.setEnabled(True)
         self.stop_button.setEnabled(False)
 
+        if self.recorder is not None:
+            self.save_recording()
+
         # Update visualization
         if self.visualizer:
             self.visualizer.draw_nodes()
@@ -306,25 +350,24 @@ class MainWindow(QMainWindow):
         adaptive = self.adaptive_check.isChecked()
 
         # Initialize simulation
-        self.simulation = LoRaMPPSimulation(
-            num_nodes=num_nodes,
-            area_size=self.area_size,
-            environment=environment.lower(),
-            adaptive=adaptive
-        )
+        self.create_simulation(num_nodes, environment, adaptive)
 
-        # Connect simulation signals
+        # Connect simulation signals through the Qt adapter
+        self.signals = QtSimulationSignals(self.simulation.signals)
+        # The logger buffers messages itself, so it is fed directly from the worker thread
         self.simulation.signals.log_message.connect(self.logger.log)
+        # Packets are queued by the visualizer and drawn on its frame timer
         self.simulation.signals.packet_sent.connect(self.handle_packet_animation)
-        self.simulation.signals.visualization_update.connect(self.update_visualization)
-        self.simulation.signals.simulation_finished.connect(self.handle_simulation_finished)
+        self.signals.visualization_update.connect(self.update_visualization)
+        self.signals.simulation_finished.connect(self.handle_simulation_finished)
 
         # Create visualizer
         self.clear_visualization_tab()
         self.visualizer = AnimationPanel(
             self.simulation.nodes,
             self.area_size,
-            environment=environment
+            environment=environment,
+            spatial_index=self.simulation.spatial_index
         )
 
         # Add to visualization tab with expanding layout
@@ -346,8 +389,8 @@ class MainWindow(QMainWindow):
 
         # Run in a separate thread
         self.simulation_thread = threading.Thread(
-            target=self.simulation.run_with_mobility,
-            kwargs={'duration': 30, 'interval': 1}
+            target=self.runner.run_with_mobility,
+            kwargs={'duration': 30, 'interval': 1, 'realtime': True}
         )
         self.simulation_thread.start()
 
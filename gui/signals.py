@@ -0,0 +1,22 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class QtSimulationSignals(QObject):
+    """Qt adapter that re-emits the core simulation callbacks as Qt signals.
+
+    Created on the GUI thread, so slots connected here are delivered through
+    queued connections even though the simulation runs in a worker thread.
+    """
+    packet_sent = pyqtSignal(object, object, bool)
+    update_metrics = pyqtSignal(dict)
+    log_message = pyqtSignal(str)
+    simulation_finished = pyqtSignal(dict)
+    visualization_update = pyqtSignal()
+
+    def __init__(self, core_signals):
+        super().__init__()
+        core_signals.packet_sent.connect(self.packet_sent.emit)
+        core_signals.update_metrics.connect(self.update_metrics.emit)
+        core_signals.log_message.connect(self.log_message.emit)
+        core_signals.simulation_finished.connect(self.simulation_finished.emit)
+        core_signals.visualization_update.connect(self.visualization_update.emit)